@@ -1,34 +1,194 @@
-from decouple import config
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import firebase_admin
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from google.auth import jwt
 from rest_framework.authentication import TokenAuthentication
 from rest_framework import exceptions
 from firebase_admin import auth, credentials, initialize_app
 
+from core.models import SecurityUser
+
 User = get_user_model()
 
-private_key = config('PRIVATE_KEY').replace('\\n', '\n')
 
-payload = {
-    'type': 'service_account',
-    'project_id': config('PROJECT_ID'),
-    'private_key': private_key,
-    'client_email': config('CLIENT_EMAIL'),
-    'token_uri': 'https://accounts.google.com/o/oauth2/token'
-}
+class FirebaseAdminVerifier(object):
+    """
+    Verifies ID tokens with the Firebase Admin SDK, initializing the
+    Firebase app on first use
+    """
+    _initialized = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def initialize_app(cls):
+        with cls._lock:
+            if cls._initialized:
+                return
+            payload = {
+                'type': 'service_account',
+                'project_id': settings.FIREBASE_PROJECT_ID,
+                'private_key': settings.FIREBASE_PRIVATE_KEY,
+                'client_email': settings.FIREBASE_CLIENT_EMAIL,
+                'token_uri': 'https://accounts.google.com/o/oauth2/token'
+            }
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                initialize_app(credentials.Certificate(payload))
+            cls._initialized = True
+
+    def verify(self, token):
+        if not self._initialized:
+            self.initialize_app()
+        return auth.verify_id_token(token)
+
+
+class LocalKeyVerifier(object):
+    """
+    Verifies RS256 ID tokens against the public keys in
+    FIREBASE_PUBLIC_KEYS_FILE, a JSON object of key ids to PEM keys or
+    certificates, without calling Google's certificate endpoint
+    """
+
+    def __init__(self):
+        with open(settings.FIREBASE_PUBLIC_KEYS_FILE) as keys_file:
+            self.public_keys = json.load(keys_file)
+        self.project_id = settings.FIREBASE_PROJECT_ID
+        self.issuer = 'https://securetoken.google.com/{}'.format(
+            self.project_id)
+
+    def verify(self, token):
+        if jwt.decode_header(token).get('alg') != 'RS256':
+            raise ValueError('ID token must be signed with RS256.')
+        claims = jwt.decode(token, certs=self.public_keys,
+                            audience=self.project_id)
+        if claims.get('iss') != self.issuer:
+            raise ValueError('ID token has an incorrect issuer.')
+        if not claims.get('sub'):
+            raise ValueError('ID token has no subject.')
+        return claims
+
+
+@lru_cache(maxsize=None)
+def get_token_verifier():
+    return import_string(settings.FIREBASE_TOKEN_VERIFIER)()
+
+
+class VerifiedTokenCache(object):
+    """
+    Bounded LRU cache of verified ID tokens.
+
+    Entries are keyed by a hash of the token, map to the id of the user it
+    was issued for and expire at the token's exp claim. Saving or deleting
+    the user drops its entries.
+    """
 
-cred = credentials.Certificate(payload)
-initialize_app(cred)
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        """Return the cached (user id, claims) of a token or None"""
+        key = self._hash(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1]['exp'] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, token, user_id, claims):
+        """Cache a verified token, ignoring tokens without an expiry"""
+        if not claims.get('exp') or self.max_size <= 0:
+            return
+        key = self._hash(token)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (user_id, claims)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        """Drop every cached token of a user"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[0]
+        user_keys = self._keys_by_user.get(user_id)
+        user_keys.discard(key)
+        if not user_keys:
+            del self._keys_by_user[user_id]
+
+
+token_cache = VerifiedTokenCache(settings.FIREBASE_TOKEN_CACHE_SIZE)
 
 
 class FirebaseTokenAuthentication(TokenAuthentication):
+    def _get_user(self, key):
+        """
+        Return the user and claims of a token, skipping its verification
+        when it is cached. The user is still loaded on every request, so
+        changes made by other processes or by queryset updates apply.
+        """
+        cached = token_cache.get(key)
+        if cached:
+            user_id, token = cached
+            user = User.objects.filter(pk=user_id).first()
+            if user and user.email == token['email']:
+                return user, token
+            token_cache.invalidate_user(user_id)
+
+        token = get_token_verifier().verify(key)
+        user = User.objects.get(email=token['email'])
+        if user.is_active:
+            token_cache.set(key, user.id, token)
+        return user, token
+
     def authenticate_credentials(self, key):
         try:
-            token = auth.verify_id_token(key)
-            email = token['email']
-            user = User.objects.get(email=email)
+            user, token = self._get_user(key)
         except Exception:
             raise exceptions.AuthenticationFailed('Unable to authenticate.')
 
         if not user.is_active:
+            token_cache.invalidate_user(user.id)
             raise exceptions.AuthenticationFailed('User inactive or deleted.')
         return (user, token)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=SecurityUser)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=SecurityUser)
+def invalidate_cached_tokens(sender, **kwargs):
+    token_cache.invalidate_user(kwargs.get('instance').id)
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.text import compress_sequence
+from rest_framework import serializers
+from rest_framework.decorators import list_route
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+# content type and file extension of each export output
+EXPORT_OUTPUTS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+
+def iterate_in_chunks(queryset, chunk_size):
+    """
+    Read a queryset through a server side cursor a chunk of rows at a
+    time, applying its prefetches to each chunk since iterator() skips them
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, *queryset._prefetch_related_lookups)
+        yield chunk
+
+
+class StreamingListMixin(object):
+    """
+    Serve list requests that are not paginated (paginate=false) as a JSON
+    array streamed a chunk of rows at a time, so memory stays flat however
+    many rows there are
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+        return StreamingHttpResponse(self.stream_json(queryset),
+                                     content_type='application/json')
+
+    def stream_json(self, queryset):
+        renderer = JSONRenderer()
+        separator = b''
+        yield b'['
+        for chunk in iterate_in_chunks(queryset, self.stream_chunk_size):
+            data = self.get_serializer(chunk, many=True).data
+            yield separator + b','.join(renderer.render(item)
+                                        for item in data)
+            separator = b','
+        yield b']'
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=JSONEncoder)
+    return value
+
+
+class ExportMixin(object):
+    """
+    Add an export action streaming every row the list endpoint returns,
+    with the same filters, as newline delimited json or csv
+    (?output=ndjson|csv), gzip compressed with ?gzip=true
+    """
+    export_chunk_size = 1000
+    export_filename = 'export'
+
+    @list_route(methods=['get'], url_path='export')
+    def export(self, request):
+        output = request.query_params.get('output', 'ndjson').lower()
+        if output not in EXPORT_OUTPUTS:
+            raise serializers.ValidationError(
+                'output must be one of {}'.format(', '.join(EXPORT_OUTPUTS)))
+        content_type, filename = EXPORT_OUTPUTS[output]
+        filename = '{}.{}'.format(self.export_filename, filename)
+        queryset = self.filter_queryset(self.get_queryset())
+        content = getattr(self, 'export_' + output)(queryset)
+
+        if request.query_params.get('gzip', '').lower() == 'true':
+            content = compress_sequence(content)
+            content_type, filename = 'application/gzip', filename + '.gz'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+            filename)
+        return response
+
+    def export_data(self, queryset):
+        """Yield the serialized rows of a queryset a chunk at a time"""
+        for chunk in iterate_in_chunks(queryset, self.export_chunk_size):
+            yield self.get_serializer(chunk, many=True).data
+
+    def export_ndjson(self, queryset):
+        renderer = JSONRenderer()
+        for data in self.export_data(queryset):
+            yield b''.join(renderer.render(item) + b'\n' for item in data)
+
+    def export_csv(self, queryset):
+        """
+        Yield csv lines with a column per field of the first row, nested
+        values written as json
+        """
+        buffer = io.StringIO()
+        writer = None
+        for data in self.export_data(queryset):
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(data[0]))
+                writer.writeheader()
+            writer.writerows({field: _csv_value(value)
+                              for field, value in item.items()}
+                             for item in data)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
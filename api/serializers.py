@@ -1,12 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+from django.urls import reverse
 from core.models import (
     User, Asset, SecurityUser, AssetLog,
-    UserFeedback, CHECKIN, CHECKOUT, AssetStatus, AllocationHistory,
-    AssetCategory, AssetSubCategory, AssetType, AssetModelNumber, AssetMake,
+    UserFeedback, CHECKIN, CHECKOUT, LOG_TYPE_CHOICES, AssetStatus,
+    AllocationHistory, AssetCategory, AssetSubCategory, AssetType,
+    AssetModelNumber, AssetMake,
     AssetCondition, AssetIncidentReport, AssetSpecs, OfficeBlock,
-    OfficeFloor, OfficeFloorSection
+    OfficeFloor, OfficeFloorSection, ImportJob
+)
+from core.services import (
+    allocate_asset, bulk_allocate_assets, change_asset_status,
+    record_asset_logs
 )
 
 
@@ -64,17 +71,28 @@ class AssetSerializer(serializers.ModelSerializer):
                   )
         depth = 1
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Join the taxonomy chain and owner, and batch-load the allocation
+        history so listing costs a fixed number of queries
+        """
+        allocations = AllocationHistory.objects.select_related(
+            'current_owner', 'previous_owner')
+        return queryset.select_related(
+            'assigned_to', 'specs',
+            'model_number__make_label__asset_type__'
+            'asset_sub_category__asset_category'
+        ).prefetch_related(
+            Prefetch('allocationhistory_set', queryset=allocations)
+        )
+
     def get_checkin_status(self, obj):
-        try:
-            asset_log = AssetLog.objects.filter(asset=obj) \
-                .order_by('-created_at').first()
-
-            if asset_log.log_type == CHECKIN:
-                return "checked_in"
-            elif asset_log.log_type == CHECKOUT:
-                return "checked_out"
-        except AttributeError:
-            return None
+        if obj.last_log_type == CHECKIN:
+            return "checked_in"
+        elif obj.last_log_type == CHECKOUT:
+            return "checked_out"
+        return None
 
     def get_asset_category(self, obj):
         return obj.model_number.make_label.asset_type.\
@@ -91,7 +109,7 @@ class AssetSerializer(serializers.ModelSerializer):
         return obj.model_number.make_label.asset_type.asset_type
 
     def get_allocation_history(self, obj):
-        allocations = AllocationHistory.objects.filter(asset=obj.id)
+        allocations = obj.allocationhistory_set.all()
         return [
             {
                 "id": allocation.id,
@@ -136,7 +154,7 @@ class AssetLogSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         instance_data = super().to_representation(instance)
-        asset = Asset.objects.get(id=instance.asset.id)
+        asset = instance.asset
         serial_no = asset.serial_number
         asset_code = asset.asset_code
         instance_data['checked_by'] = instance.checked_by.email
@@ -144,6 +162,21 @@ class AssetLogSerializer(serializers.ModelSerializer):
         return instance_data
 
 
+class AssetLogScanSerializer(serializers.Serializer):
+    asset = serializers.CharField(max_length=50)
+    log_type = serializers.ChoiceField(choices=LOG_TYPE_CHOICES)
+    idempotency_key = serializers.CharField(max_length=64)
+    scanned_at = serializers.DateTimeField()
+
+
+class AssetLogBatchSerializer(serializers.Serializer):
+    scans = AssetLogScanSerializer(many=True, allow_empty=False)
+
+    def create(self, validated_data):
+        return record_asset_logs(validated_data['scans'],
+                                 validated_data['checked_by'])
+
+
 class UserFeedbackSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserFeedback
@@ -178,6 +211,13 @@ class AssetStatusSerializer(AssetSerializer):
             for asset in asset_status if obj.created_at > asset.created_at
         ]
 
+    def create(self, validated_data):
+        try:
+            return change_asset_status(validated_data['asset'],
+                                       validated_data['current_status'])
+        except ValidationError as err:
+            raise serializers.ValidationError(err.messages)
+
     def to_representation(self, instance):
         instance_data = super().to_representation(instance)
         asset = Asset.objects.get(id=instance.asset.id)
@@ -193,9 +233,16 @@ class AllocationsSerializer(serializers.ModelSerializer):
         fields = ("asset", "current_owner", "previous_owner", "created_at")
         read_only_fields = ("previous_owner",)
 
+    def create(self, validated_data):
+        try:
+            return allocate_asset(validated_data['asset'],
+                                  validated_data.get('current_owner'))
+        except ValidationError as err:
+            raise serializers.ValidationError(err.messages)
+
     def to_representation(self, instance):
         instance_data = super().to_representation(instance)
-        asset = Asset.objects.get(id=instance.asset.id)
+        asset = instance.asset
         serial_no = asset.serial_number
         asset_code = asset.asset_code
 
@@ -209,6 +256,21 @@ class AllocationsSerializer(serializers.ModelSerializer):
         return instance_data
 
 
+class BulkAllocationItemSerializer(serializers.Serializer):
+    asset = serializers.CharField(max_length=50)
+    email = serializers.EmailField()
+
+
+class BulkAllocationSerializer(serializers.Serializer):
+    allocations = BulkAllocationItemSerializer(many=True, allow_empty=False)
+
+    def create(self, validated_data):
+        return bulk_allocate_assets([
+            (allocation['asset'], allocation['email'])
+            for allocation in validated_data['allocations']
+        ])
+
+
 class AssetCategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = AssetCategory
@@ -245,7 +307,7 @@ class AssetTypeSerializer(serializers.ModelSerializer):
 class AssetModelNumberSerializer(serializers.ModelSerializer):
     class Meta:
         model = AssetModelNumber
-        fields = ('id', 'model_number', 'make_label',
+        fields = ('id', 'model_number', 'make_label', 'low_stock_threshold',
                   'created_at', 'last_modified')
 
     def to_representation(self, instance):
@@ -425,3 +487,27 @@ class OfficeFloorSectionSerializer(serializers.ModelSerializer):
     class Meta:
         model = OfficeFloorSection
         fields = ("name", "floor", "id")
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    skipped_rows_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = (
+            'id', 'import_type', 'file', 'status', 'total_rows',
+            'processed_rows', 'inserted', 'skipped', 'skipped_rows_url',
+            'error', 'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = (
+            'status', 'total_rows', 'processed_rows', 'inserted', 'skipped',
+            'error', 'created_at', 'started_at', 'finished_at'
+        )
+        extra_kwargs = {'file': {'write_only': True}}
+
+    def get_skipped_rows_url(self, obj):
+        if not obj.skipped_file:
+            return None
+        url = reverse('import-jobs-skipped', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
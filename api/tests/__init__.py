@@ -2,6 +2,7 @@ from django.test import TestCase
 from unittest.mock import patch
 
 from core.slack_bot import SlackIntegration
+from api.authentication import FirebaseAdminVerifier
 
 
 class APIBaseTestCase(TestCase):
@@ -11,11 +12,16 @@ class APIBaseTestCase(TestCase):
         self.patch_send_message = patch.object(
             SlackIntegration, 'send_message')
 
+        self.patch_firebase_app = patch.object(
+            FirebaseAdminVerifier, 'initialize_app')
+
         self.patch_slack_id.return_value = 'test_id'
         self.patch_send_message.return_value = ''
         self.patch_slack_id.start()
         self.patch_send_message.start()
+        self.patch_firebase_app.start()
 
     def tearDown(self):
         self.patch_slack_id.stop()
         self.patch_send_message.stop()
+        self.patch_firebase_app.stop()
@@ -113,3 +113,52 @@ class AllocationTestCase(APIBaseTestCase):
         self.assertEquals(
             response.data['serial_number'], self.asset.serial_number)
         self.assertEquals(response.status_code, 200)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_bulk_allocate_assets(self, mock_verify_id_token):
+        """Test allocating many assets in one request"""
+        admin = User.objects.create_superuser(
+            email='admin@site.com', cohort=20,
+            slack_handle='@admin', password='devpassword'
+        )
+        other_asset = Asset.objects.create(
+            asset_code="IC002",
+            serial_number="SN002",
+            model_number=self.asset.model_number
+        )
+        mock_verify_id_token.return_value = {'email': admin.email}
+        data = {'allocations': [
+            {'asset': self.asset.serial_number, 'email': self.user.email},
+            {'asset': 'ic002', 'email': self.other_user.email},
+            {'asset': self.asset.asset_code, 'email': self.other_user.email},
+            {'asset': 'SN404', 'email': self.user.email},
+        ]}
+        response = client.post(
+            f"{self.allocations_urls}/bulk", data, format='json',
+            HTTP_AUTHORIZATION=f"Token {self.token_user}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['allocated'], 2)
+        self.assertEqual(response.data['skipped'], 2)
+        self.assertEqual(
+            [result['allocated'] for result in response.data['results']],
+            [True, True, False, False])
+        self.assertEqual(response.data['results'][3]['reason'],
+                         'asset not found')
+        other_asset.refresh_from_db()
+        self.assertEqual(other_asset.assigned_to, self.other_user)
+        self.assertEqual(other_asset.current_status, 'Allocated')
+        self.assertEqual(AllocationHistory.objects.count(), 2)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_non_admin_cannot_bulk_allocate_assets(self,
+                                                   mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.user.email}
+        data = {'allocations': [
+            {'asset': self.asset.serial_number, 'email': self.user.email},
+        ]}
+        response = client.post(
+            f"{self.allocations_urls}/bulk", data, format='json',
+            HTTP_AUTHORIZATION=f"Token {self.token_user}")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(AllocationHistory.objects.count(), 0)
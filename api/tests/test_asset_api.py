@@ -1,5 +1,7 @@
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
@@ -285,3 +287,32 @@ class AssetTestCase(APIBaseTestCase):
             HTTP_AUTHORIZATION="Token {}".format(self.token_user))
         self.assertIn('notes', response.data.keys())
         self.assertEqual(response.status_code, 200)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_list_assets_query_count_does_not_grow_with_rows(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.user.email}
+        with CaptureQueriesContext(connection) as single_asset_queries:
+            client.get(
+                self.asset_urls,
+                HTTP_AUTHORIZATION="Token {}".format(self.token_user))
+
+        for index in range(5):
+            asset = Asset(
+                asset_code="IC10{}".format(index),
+                serial_number="SN10{}".format(index),
+                model_number=self.assetmodel,
+            )
+            asset.save()
+            AllocationHistory.objects.create(
+                asset=asset, current_owner=self.user)
+            AssetLog.objects.create(
+                checked_by=self.checked_by, asset=asset, log_type="Checkout")
+
+        with CaptureQueriesContext(connection) as many_asset_queries:
+            response = client.get(
+                self.asset_urls,
+                HTTP_AUTHORIZATION="Token {}".format(self.token_user))
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertTrue(response.data['results'][0]['allocation_history'])
+        self.assertEqual(len(many_asset_queries), len(single_asset_queries))
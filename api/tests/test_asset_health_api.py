@@ -6,6 +6,7 @@ from rest_framework.test import APIClient
 from core.models import (Asset,
                          AssetModelNumber,
                          AllocationHistory,
+                         AssetStatus,
                          AssetMake,
                          AssetType,
                          AssetSubCategory,
@@ -140,3 +141,34 @@ class AssetHealthTestCase(APIBaseTestCase):
         self.assertEqual(response.data[0]['asset_type'],
                          self.asset_type.asset_type)
         self.assertEqual(response.status_code, 200)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_asset_health_counts_each_model_number_by_status(
+            self, mock_verify_id_token):
+        other_model = AssetModelNumber.objects.create(
+            model_number="IMN50988", make_label=self.make_label)
+        for index in range(3):
+            Asset.objects.create(
+                asset_code="IC10{}".format(index),
+                serial_number="SN10{}".format(index),
+                model_number=other_model)
+        damaged_asset = Asset.objects.get(asset_code="IC100")
+        AssetStatus.objects.create(asset=damaged_asset,
+                                   current_status="Damaged")
+
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        response = client.get(
+            self.asset_urls,
+            HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        asset_health = {
+            item['model_number']: item['count_by_status']
+            for item in response.data
+        }
+        self.assertEqual(asset_health['IMN50988'], {
+            'Allocated': 0, 'Available': 2, 'Damaged': 1, 'Lost': 0
+        })
+        self.assertEqual(asset_health['IMN50987'], {
+            'Allocated': 1, 'Available': 0, 'Damaged': 0, 'Lost': 0
+        })
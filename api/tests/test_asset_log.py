@@ -1,3 +1,7 @@
+import csv
+import gzip
+import io
+import json
 from unittest.mock import patch
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
@@ -291,3 +295,168 @@ class AssetLogModelTest(APIBaseTestCase):
             'detail': 'Method "PATCH" not allowed.'
         })
         self.assertEqual(response.status_code, 405)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_security_user_records_batch_of_scans(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        data = {'scans': [
+            {'asset': self.test_other_asset.serial_number,
+             'log_type': 'Checkin', 'idempotency_key': 'scan-1',
+             'scanned_at': '2018-08-01T08:00:00Z'},
+            {'asset': 'ic001', 'log_type': 'Checkout',
+             'idempotency_key': 'scan-2',
+             'scanned_at': '2018-08-01T08:01:00Z'},
+            {'asset': 'SN404', 'log_type': 'Checkin',
+             'idempotency_key': 'scan-3',
+             'scanned_at': '2018-08-01T08:02:00Z'},
+        ]}
+        response = client.post(
+            f"{self.asset_logs_url}/batch", data, format='json',
+            HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'created', 'rejected'])
+        self.assertEqual(AssetLog.objects.count(), 4)
+        log = AssetLog.objects.get(idempotency_key='scan-2')
+        self.assertEqual(log.asset, self.test_asset)
+        self.assertEqual(log.checked_by, self.checked_by)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_retried_batch_of_scans_is_not_duplicated(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        scan = {'asset': self.test_other_asset.serial_number,
+                'log_type': 'Checkin', 'idempotency_key': 'scan-1',
+                'scanned_at': '2018-08-01T08:00:00Z'}
+        for _ in range(2):
+            response = client.post(
+                f"{self.asset_logs_url}/batch", {'scans': [scan, scan]},
+                format='json',
+                HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['results'][0]['status'], 'duplicate')
+        self.assertEqual(
+            AssetLog.objects.filter(idempotency_key='scan-1').count(), 1)
+
+    def post_scans(self, *scans):
+        return client.post(
+            f"{self.asset_logs_url}/batch",
+            {'scans': [{'asset': self.test_other_asset.serial_number,
+                        'log_type': log_type,
+                        'idempotency_key': f"scan-{scanned_at}",
+                        'scanned_at': f"2018-08-01T{scanned_at}Z"}
+                       for log_type, scanned_at in scans]},
+            format='json',
+            HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_out_of_order_scans_keep_latest_checkin_state(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        self.post_scans(('Checkout', '08:05:00'), ('Checkin', '08:00:00'))
+        self.test_other_asset.refresh_from_db()
+        self.assertEqual(self.test_other_asset.last_log_type, 'Checkout')
+        self.assertEqual(self.test_other_asset.last_log_at.isoformat(),
+                         '2018-08-01T08:05:00+00:00')
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_late_batch_does_not_roll_back_checkin_state(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        self.post_scans(('Checkin', '09:00:00'))
+        response = self.post_scans(('Checkout', '08:00:00'),
+                                   ('Checkin', '08:30:00'))
+        self.assertEqual(response.data['created'], 2)
+        self.test_other_asset.refresh_from_db()
+        self.assertEqual(self.test_other_asset.last_log_type, 'Checkin')
+        self.assertEqual(self.test_other_asset.last_log_at.isoformat(),
+                         '2018-08-01T09:00:00+00:00')
+
+        self.post_scans(('Checkout', '09:30:00'))
+        self.test_other_asset.refresh_from_db()
+        self.assertEqual(self.test_other_asset.last_log_type, 'Checkout')
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_normal_user_cannot_record_batch_of_scans(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.normal_user.email}
+        response = client.post(
+            f"{self.asset_logs_url}/batch", {'scans': []}, format='json',
+            HTTP_AUTHORIZATION="Token {}".format(self.token_normal_user))
+        self.assertEqual(response.status_code, 403)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_asset_logs_paginate_with_cursor(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        AssetLog.objects.create(checked_by=self.checked_by,
+                                asset=self.test_other_asset,
+                                log_type="Checkin")
+        # rows sharing a timestamp are ordered by id
+        AssetLog.objects.update(created_at=self.checkin.created_at)
+        expected = list(AssetLog.objects.order_by('-id').values_list(
+            'id', flat=True))
+        url = f"{self.asset_logs_url}?pagination=cursor&page_size=2"
+        seen = []
+        while url:
+            response = client.get(
+                url,
+                HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+            self.assertNotIn('count', response.data)
+            seen.extend(log['id'] for log in response.data['results'])
+            previous, url = response.data['previous'], response.data['next']
+        self.assertEqual(seen, expected)
+
+        response = client.get(
+            previous,
+            HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+        self.assertEqual([log['id'] for log in response.data['results']],
+                         expected[:2])
+        self.assertIsNone(response.data['previous'])
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_asset_logs_invalid_cursor(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        response = client.get(
+            f"{self.asset_logs_url}?cursor=bad",
+            HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+        self.assertEqual(response.status_code, 404)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_export_asset_logs_as_ndjson(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        response = client.get(
+            f"{self.asset_logs_url}/export",
+            HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('asset-logs.ndjson', response['Content-Disposition'])
+        # the rows are read through one query however many there are
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content).decode()
+        logs = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([log['id'] for log in logs],
+                         list(AssetLog.objects.values_list('id', flat=True)))
+        self.assertEqual(logs[0]['checked_by'], self.checked_by.email)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_export_asset_logs_as_gzipped_csv(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        response = client.get(
+            f"{self.asset_logs_url}/export?output=csv&gzip=true",
+            HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('asset-logs.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        logs = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(len(logs), AssetLog.objects.count())
+        self.assertEqual(logs[0]['asset'], 'SN001 - IC001')
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_export_with_unknown_output(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.checked_by.email}
+        response = client.get(
+            f"{self.asset_logs_url}/export?output=xml",
+            HTTP_AUTHORIZATION="Token {}".format(self.token_checked_by))
+        self.assertEqual(response.status_code, 400)
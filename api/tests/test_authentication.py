@@ -0,0 +1,181 @@
+import json
+import tempfile
+import time
+from unittest.mock import patch
+
+import rsa
+from django.test import override_settings
+from google.auth import crypt, jwt
+from rest_framework.test import APIClient
+from rest_framework.reverse import reverse
+
+from core.models import User
+from api.authentication import (
+    token_cache, FirebaseTokenAuthentication, LocalKeyVerifier,
+    VerifiedTokenCache
+)
+
+from api.tests import APIBaseTestCase
+client = APIClient()
+
+
+class FirebaseTokenCacheTest(APIBaseTestCase):
+    """Tests for caching verified Firebase ID tokens"""
+
+    def setUp(self):
+        super(FirebaseTokenCacheTest, self).setUp()
+        token_cache.clear()
+        self.user = User.objects.create(
+            email='test@site.com', cohort=20,
+            slack_handle='@test_user', password='devpassword'
+        )
+        self.feedback_url = reverse('user-feedback-list')
+        self.token_user = 'testtoken'
+        self.claims = {'email': self.user.email, 'exp': time.time() + 3600}
+
+    def tearDown(self):
+        token_cache.clear()
+        super(FirebaseTokenCacheTest, self).tearDown()
+
+    def get_feedback(self):
+        return client.get(
+            self.feedback_url,
+            HTTP_AUTHORIZATION="Token {}".format(self.token_user))
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_verified_token_is_reused(self, mock_verify_token):
+        mock_verify_token.return_value = self.claims
+        self.assertEqual(self.get_feedback().status_code, 200)
+        self.assertEqual(self.get_feedback().status_code, 200)
+        self.assertEqual(mock_verify_token.call_count, 1)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_expired_token_is_verified_again(self, mock_verify_token):
+        self.claims['exp'] = time.time() - 1
+        mock_verify_token.return_value = self.claims
+        self.get_feedback()
+        self.get_feedback()
+        self.assertEqual(mock_verify_token.call_count, 2)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_deactivated_user_cannot_use_cached_token(self,
+                                                      mock_verify_token):
+        mock_verify_token.return_value = self.claims
+        self.get_feedback()
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token_user))
+        self.assertEqual(self.get_feedback().status_code, 401)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_cached_token_loads_user_by_id(self, mock_verify_token):
+        mock_verify_token.return_value = self.claims
+        self.get_feedback()
+        with self.assertNumQueries(1):
+            user, claims = FirebaseTokenAuthentication() \
+                .authenticate_credentials(self.token_user)
+        self.assertEqual(user, self.user)
+        self.assertEqual(claims, self.claims)
+        self.assertEqual(token_cache.get(self.token_user),
+                         (self.user.id, self.claims))
+        self.assertEqual(mock_verify_token.call_count, 1)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_user_updated_without_signal_is_loaded_again(self,
+                                                         mock_verify_token):
+        mock_verify_token.return_value = self.claims
+        self.get_feedback()
+        User.objects.filter(pk=self.user.pk).update(first_name='Renamed')
+        user, _ = FirebaseTokenAuthentication().authenticate_credentials(
+            self.token_user)
+        self.assertEqual(user.first_name, 'Renamed')
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_user_deactivated_without_signal_is_rejected(self,
+                                                         mock_verify_token):
+        mock_verify_token.return_value = self.claims
+        self.get_feedback()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get_feedback().status_code, 401)
+        self.assertIsNone(token_cache.get(self.token_user))
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_token_of_changed_email_is_verified_again(self,
+                                                      mock_verify_token):
+        mock_verify_token.return_value = self.claims
+        self.get_feedback()
+        User.objects.filter(pk=self.user.pk).update(email='new@site.com')
+        self.assertEqual(self.get_feedback().status_code, 401)
+        self.assertEqual(mock_verify_token.call_count, 2)
+
+    def test_cache_evicts_least_recently_used_token(self):
+        cache = VerifiedTokenCache(max_size=2)
+        cache.set('first', 1, self.claims)
+        cache.set('second', 2, self.claims)
+        cache.get('first')
+        cache.set('third', 3, self.claims)
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.get('first'), (1, self.claims))
+
+
+class LocalKeyVerifierTest(APIBaseTestCase):
+    """Tests for verifying ID tokens against local public keys"""
+
+    def setUp(self):
+        super(LocalKeyVerifierTest, self).setUp()
+        token_cache.clear()
+        self.user = User.objects.create(
+            email='test@site.com', cohort=20,
+            slack_handle='@test_user', password='devpassword'
+        )
+        public_key, private_key = rsa.newkeys(1024)
+        self.signer = crypt.RSASigner.from_string(
+            private_key.save_pkcs1(), key_id='test-key')
+        self.keys_file = tempfile.NamedTemporaryFile('w', suffix='.json')
+        json.dump({'test-key': public_key.save_pkcs1().decode()},
+                  self.keys_file)
+        self.keys_file.flush()
+        self.settings_override = override_settings(
+            FIREBASE_PUBLIC_KEYS_FILE=self.keys_file.name,
+            FIREBASE_PROJECT_ID='art-test')
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.keys_file.close()
+        token_cache.clear()
+        super(LocalKeyVerifierTest, self).tearDown()
+
+    def make_token(self, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://securetoken.google.com/art-test',
+            'aud': 'art-test',
+            'sub': 'firebase-uid',
+            'email': self.user.email,
+            'iat': now,
+            'exp': now + 3600
+        }
+        payload.update(claims)
+        return jwt.encode(self.signer, payload).decode()
+
+    def test_valid_token_is_verified(self):
+        claims = LocalKeyVerifier().verify(self.make_token())
+        self.assertEqual(claims['email'], self.user.email)
+
+    def test_token_for_another_project_is_rejected(self):
+        with self.assertRaises(ValueError):
+            LocalKeyVerifier().verify(self.make_token(aud='other-project'))
+
+    def test_token_from_another_issuer_is_rejected(self):
+        with self.assertRaises(ValueError):
+            LocalKeyVerifier().verify(
+                self.make_token(iss='https://example.com'))
+
+    def test_authenticates_request_with_local_verifier(self):
+        with patch('api.authentication.get_token_verifier',
+                   return_value=LocalKeyVerifier()):
+            response = client.get(
+                reverse('user-feedback-list'),
+                HTTP_AUTHORIZATION="Token {}".format(self.make_token()))
+        self.assertEqual(response.status_code, 200)
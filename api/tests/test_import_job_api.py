@@ -0,0 +1,163 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.reverse import reverse
+
+from core.imports import JOB_TIMEOUT, run_next_job
+from core.models import User, Asset, ImportJob
+
+from api.tests import APIBaseTestCase
+client = APIClient()
+
+ASSET_CSV = (
+    "Category,Sub-Category,Type,Make,Model Number,Asset Code,Serial No.\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/001,SN001\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/002,SN002\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/001,SN003\n"
+)
+
+
+class ImportJobAPITest(APIBaseTestCase):
+    """Tests for the ImportJob endpoint"""
+
+    def setUp(self):
+        super(ImportJobAPITest, self).setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.media = override_settings(MEDIA_ROOT=self.media_root)
+        self.media.enable()
+        self.token_admin = 'admintesttoken'
+        self.token_user = 'usertesttoken'
+        self.admin = User.objects.create_superuser(
+            email='testadmin@gmail.com', cohort=19,
+            slack_handle='tester', password='qwerty123'
+        )
+        self.user = User.objects.create(
+            email='testuser@gmail.com', cohort=19,
+            slack_handle='tester', password='qwerty123'
+        )
+        self.import_jobs_url = reverse('import-jobs-list')
+
+    def tearDown(self):
+        self.media.disable()
+        shutil.rmtree(self.media_root)
+        super(ImportJobAPITest, self).tearDown()
+
+    def upload(self, content, import_type='assets'):
+        return client.post(
+            self.import_jobs_url,
+            data={'import_type': import_type,
+                  'file': SimpleUploadedFile('import.csv',
+                                             content.encode())},
+            format='multipart',
+            HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_admin_can_upload_csv(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        response = self.upload(ASSET_CSV)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'Queued')
+        self.assertNotIn('file', response.data)
+        self.assertEqual(ImportJob.objects.get().created_by, self.admin)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_non_admin_cannot_upload_csv(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.user.email}
+        response = client.post(
+            self.import_jobs_url,
+            data={'import_type': 'assets',
+                  'file': SimpleUploadedFile('import.csv', b'')},
+            format='multipart',
+            HTTP_AUTHORIZATION="Token {}".format(self.token_user))
+        self.assertEqual(response.status_code, 403)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_job_reports_asset_import_progress(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        job_id = self.upload(ASSET_CSV).data['id']
+        run_next_job()
+        response = client.get(
+            '{}/{}/'.format(self.import_jobs_url, job_id),
+            HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+        self.assertEqual(response.data['status'], 'Completed')
+        self.assertEqual(response.data['total_rows'], 3)
+        self.assertEqual(response.data['processed_rows'], 3)
+        self.assertEqual(response.data['inserted'], 2)
+        self.assertEqual(response.data['skipped'], 1)
+        self.assertEqual(Asset.objects.count(), 2)
+
+        skipped = client.get(
+            response.data['skipped_rows_url'],
+            HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+        self.assertEqual(skipped.status_code, 200)
+        report = b''.join(skipped.streaming_content).decode()
+        self.assertIn('asset_code AND/001 already exists.', report)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_job_imports_users(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        job_id = self.upload(
+            "first_name,last_name,email,cohort,picture,phone_number\n"
+            "Jane,Doe,jane@site.com,12,,\n"
+            "Test,User,testuser@gmail.com,19,,\n",
+            import_type='users').data['id']
+        run_next_job()
+        job = ImportJob.objects.get(pk=job_id)
+        self.assertEqual((job.inserted, job.skipped), (1, 1))
+        self.assertTrue(User.objects.filter(email='jane@site.com').exists())
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_skipped_rows_not_found_without_report(self,
+                                                   mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        job = ImportJob.objects.create(import_type='assets', file='x.csv')
+        response = client.get(
+            '{}/{}/skipped'.format(self.import_jobs_url, job.id),
+            HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+        self.assertEqual(response.status_code, 404)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_job_left_running_by_dead_worker_fails(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        stale = timezone.now() - timedelta(seconds=JOB_TIMEOUT + 60)
+        dead = ImportJob.objects.create(
+            import_type='assets', file='x.csv', status='Running',
+            started_at=stale, heartbeat_at=stale)
+        alive = ImportJob.objects.create(
+            import_type='assets', file='y.csv', status='Running',
+            started_at=stale, heartbeat_at=timezone.now())
+        self.assertIsNone(run_next_job())
+        dead.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(dead.status, 'Failed')
+        self.assertIn('stopped responding', dead.error)
+        self.assertIsNotNone(dead.finished_at)
+        self.assertEqual(alive.status, 'Running')
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_job_failed_as_stale_keeps_its_failure(self,
+                                                   mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        job_id = self.upload(ASSET_CSV).data['id']
+
+        def fail_job(job):
+            ImportJob.objects.filter(pk=job.pk).update(status='Failed')
+        with patch('core.imports.run_job', side_effect=fail_job):
+            run_next_job()
+        self.assertEqual(ImportJob.objects.get(pk=job_id).status, 'Failed')
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_job_progress_refreshes_heartbeat(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        job_id = self.upload(ASSET_CSV).data['id']
+        run_next_job()
+        job = ImportJob.objects.get(pk=job_id)
+        self.assertGreaterEqual(job.heartbeat_at, job.started_at)
+        self.assertEqual(job.status, 'Completed')
@@ -1,5 +1,10 @@
+import csv
+import io
+import json
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
@@ -127,6 +132,35 @@ class ManageAssetTestCase(APIBaseTestCase):
         self.assertEqual(len(response.data['results']), Asset.objects.count())
         self.assertEqual(response.status_code, 200)
 
+    @patch('api.authentication.auth.verify_id_token')
+    def test_unpaginated_assets_are_streamed(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        response = client.get(
+            '{}?paginate=false'.format(self.manage_asset_urls),
+            HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        assets = json.loads(b''.join(response.streaming_content).decode())
+        self.assertEqual(len(assets), Asset.objects.count())
+        self.assertEqual(assets[0]['asset_code'], self.asset.asset_code)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_export_assets_with_list_filters(self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        response = client.get(
+            '{}/export?output=csv&email={}'.format(self.manage_asset_urls,
+                                                   self.user.email),
+            HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        assets = list(csv.DictReader(io.StringIO(
+            b''.join(response.streaming_content).decode())))
+        self.assertEqual(
+            [asset['serial_number'] for asset in assets],
+            list(Asset.objects.filter(assigned_to=self.user).values_list(
+                'serial_number', flat=True)))
+        self.assertEqual(json.loads(assets[0]['assigned_to'])['email'],
+                         self.user.email)
+
     @patch('api.authentication.auth.verify_id_token')
     def test_admin_can_post_asset(self, mock_verify_id_token):
         mock_verify_id_token.return_value = {'email': self.admin.email}
@@ -365,3 +399,33 @@ class ManageAssetTestCase(APIBaseTestCase):
             HTTP_AUTHORIZATION="Token {}".format(self.token_user))
         self.assertIn('allocation_history', response.data.keys())
         self.assertEqual(response.status_code, 200)
+
+    @patch('api.authentication.auth.verify_id_token')
+    def test_list_assets_query_count_does_not_grow_with_rows(
+            self, mock_verify_id_token):
+        mock_verify_id_token.return_value = {'email': self.admin.email}
+        with CaptureQueriesContext(connection) as single_asset_queries:
+            client.get(
+                self.manage_asset_urls,
+                HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+
+        for index in range(5):
+            asset = Asset(
+                asset_code="IC10{}".format(index),
+                serial_number="SN10{}".format(index),
+                model_number=self.assetmodel,
+            )
+            asset.save()
+            AllocationHistory.objects.create(
+                asset=asset, current_owner=self.other_user)
+            AssetLog.objects.create(
+                checked_by=self.checked_by, asset=asset, log_type="Checkin")
+
+        with CaptureQueriesContext(connection) as many_asset_queries:
+            response = client.get(
+                self.manage_asset_urls,
+                HTTP_AUTHORIZATION="Token {}".format(self.token_admin))
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(response.data['results'][0]['checkin_status'],
+                         "checked_in")
+        self.assertEqual(len(many_asset_queries), len(single_asset_queries))
@@ -13,7 +13,7 @@ from .views import UserViewSet, AssetViewSet, SecurityUserEmailsViewSet, \
     AssetMakeViewSet, AssetIncidentReportViewSet, AssetHealthCountViewSet, \
     ManageAssetViewSet, SecurityUserViewSet, AssetSpecsViewSet,\
     OfficeBlockViewSet, OfficeFloorViewSet, OfficeFloorSectionViewSet, \
-    GroupViewSet
+    GroupViewSet, ImportJobViewSet
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -62,6 +62,7 @@ router.register('user-groups', GroupViewSet, 'user-groups')
 router.register('office-blocks', OfficeBlockViewSet, 'office-blocks')
 router.register('office-floors', OfficeFloorViewSet, 'office-floors')
 router.register('office-sections', OfficeFloorSectionViewSet, 'floor-sections')
+router.register('import-jobs', ImportJobViewSet, 'import-jobs')
 
 urlpatterns = [
     path('api-auth/', include('rest_framework.urls')),
@@ -3,17 +3,22 @@ from django.db.utils import IntegrityError
 from django.contrib.auth.models import Group
 from django.core.validators import validate_email, ValidationError
 from rest_framework import serializers
+from django.http import FileResponse, Http404
+from rest_framework.decorators import detail_route, list_route
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status
-from itertools import chain
+from collections import OrderedDict
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.viewsets import ModelViewSet
 from api.authentication import FirebaseTokenAuthentication
+from api.mixins import ExportMixin, StreamingListMixin
+from core.pagination import HistoryPagination
 from core.models import Asset, SecurityUser, AssetLog, UserFeedback, \
     AssetStatus, AllocationHistory, AssetCategory, AssetSubCategory, \
     AssetType, AssetModelNumber, AssetCondition, AssetMake, \
-    AssetIncidentReport, AssetSpecs
+    AssetIncidentReport, AssetSpecs, AssetStatusCount, ImportJob, \
+    ASSET_STATUSES
 from core.models.officeblock import (
     OfficeBlock,
     OfficeFloor,
@@ -27,13 +32,14 @@ from .serializers import UserSerializer, \
     AssetMakeSerializer, AssetIncidentReportSerializer, \
     AssetHealthSerializer, SecurityUserSerializer, \
     AssetSpecsSerializer, OfficeBlockSerializer, \
-    OfficeFloorSectionSerializer, OfficeFloorSerializer, UserGroupSerializer
+    OfficeFloorSectionSerializer, OfficeFloorSerializer, UserGroupSerializer, \
+    BulkAllocationSerializer, AssetLogBatchSerializer, ImportJobSerializer
 from api.permissions import IsApiUser, IsSecurityUser
 
 User = get_user_model()
 
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(StreamingListMixin, ModelViewSet):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = (IsAuthenticated, IsAdminUser)
@@ -41,11 +47,12 @@ class UserViewSet(ModelViewSet):
     http_method_names = ['get', 'post']
 
 
-class ManageAssetViewSet(ModelViewSet):
+class ManageAssetViewSet(ExportMixin, StreamingListMixin, ModelViewSet):
     serializer_class = AssetSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
     authentication_classes = (FirebaseTokenAuthentication,)
     http_method_names = ['get', 'post', 'put', 'delete']
+    export_filename = 'assets'
 
     def get_queryset(self):
         queryset = Asset.objects.all()
@@ -59,10 +66,10 @@ class ManageAssetViewSet(ModelViewSet):
                 raise serializers.ValidationError(error.message)
             queryset = Asset.objects.filter(assigned_to__email=email)
 
-        return queryset
+        return AssetSerializer.setup_eager_loading(queryset)
 
     def get_object(self):
-        queryset = Asset.objects.all()
+        queryset = AssetSerializer.setup_eager_loading(Asset.objects.all())
         obj = get_object_or_404(queryset, serial_number=self.kwargs['pk'])
         return obj
 
@@ -74,7 +81,7 @@ class ManageAssetViewSet(ModelViewSet):
         return response
 
 
-class AssetViewSet(ModelViewSet):
+class AssetViewSet(StreamingListMixin, ModelViewSet):
     serializer_class = AssetSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = (FirebaseTokenAuthentication,)
@@ -93,11 +100,12 @@ class AssetViewSet(ModelViewSet):
                 raise serializers.ValidationError(error.message)
             queryset = Asset.objects.filter(assigned_to__email=email)
 
-        return queryset
+        return AssetSerializer.setup_eager_loading(queryset)
 
     def get_object(self):
         user = self.request.user
-        queryset = Asset.objects.filter(assigned_to=user)
+        queryset = AssetSerializer.setup_eager_loading(
+            Asset.objects.filter(assigned_to=user))
         obj = get_object_or_404(queryset, serial_number=self.kwargs['pk'])
         return obj
 
@@ -114,16 +122,30 @@ class SecurityUserEmailsViewSet(ModelViewSet):
         return Response({'emails': list_of_emails}, status=status.HTTP_200_OK)
 
 
-class AssetLogViewSet(ModelViewSet):
+class AssetLogViewSet(ExportMixin, StreamingListMixin, ModelViewSet):
     serializer_class = AssetLogSerializer
-    queryset = AssetLog.objects.all()
+    queryset = AssetLog.objects.select_related('asset', 'checked_by')
     permission_classes = [IsSecurityUser]
     authentication_classes = (FirebaseTokenAuthentication,)
     http_method_names = ['get', 'post']
+    pagination_class = HistoryPagination
+    export_filename = 'asset-logs'
 
     def perform_create(self, serializer):
         serializer.save(checked_by=self.request.user.securityuser)
 
+    @list_route(methods=['post'], url_path='batch',
+                serializer_class=AssetLogBatchSerializer)
+    def batch(self, request):
+        serializer = AssetLogBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save(checked_by=request.user.securityuser)
+        return Response({
+            'created': sum(
+                1 for result in results if result['status'] == 'created'),
+            'results': results
+        }, status=status.HTTP_200_OK)
+
 
 class UserFeedbackViewSet(ModelViewSet):
     serializer_class = UserFeedbackSerializer
@@ -136,20 +158,38 @@ class UserFeedbackViewSet(ModelViewSet):
         serializer.save(reported_by=self.request.user)
 
 
-class AssetStatusViewSet(ModelViewSet):
+class AssetStatusViewSet(StreamingListMixin, ModelViewSet):
     serializer_class = AssetStatusSerializer
     queryset = AssetStatus.objects.all()
     permission_classes = [IsAuthenticated, ]
     authentication_classes = [FirebaseTokenAuthentication, ]
     http_method_names = ['get', 'post']
+    pagination_class = HistoryPagination
 
 
-class AllocationsViewSet(ModelViewSet):
+class AllocationsViewSet(ExportMixin, StreamingListMixin, ModelViewSet):
     serializer_class = AllocationsSerializer
-    queryset = AllocationHistory.objects.all()
+    queryset = AllocationHistory.objects.select_related(
+        'asset', 'current_owner', 'previous_owner')
     permission_classes = [IsAuthenticated, ]
     authentication_classes = (FirebaseTokenAuthentication,)
     http_method_names = ['get', 'post']
+    pagination_class = HistoryPagination
+    export_filename = 'allocations'
+
+    @list_route(methods=['post'], url_path='bulk',
+                permission_classes=[IsAuthenticated, IsAdminUser],
+                serializer_class=BulkAllocationSerializer)
+    def bulk(self, request):
+        serializer = BulkAllocationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        allocated = sum(1 for result in results if result['allocated'])
+        return Response({
+            'allocated': allocated,
+            'skipped': len(results) - allocated,
+            'results': results
+        }, status=status.HTTP_200_OK)
 
 
 class AssetCategoryViewSet(ModelViewSet):
@@ -192,12 +232,13 @@ class AssetMakeViewSet(ModelViewSet):
     http_method_names = ['get', 'post']
 
 
-class AssetConditionViewSet(ModelViewSet):
+class AssetConditionViewSet(StreamingListMixin, ModelViewSet):
     serializer_class = AssetConditionSerializer
     queryset = AssetCondition.objects.all()
     permission_classes = [IsAuthenticated, ]
     authentication_classes = (FirebaseTokenAuthentication,)
     http_method_names = ['get', 'post']
+    pagination_class = HistoryPagination
 
 
 class AssetIncidentReportViewSet(ModelViewSet):
@@ -217,57 +258,41 @@ class AssetHealthCountViewSet(ModelViewSet):
     authentication_classes = (FirebaseTokenAuthentication, )
     http_method_names = ['get', ]
     queryset = Asset.objects.all()
-    data = None
-
-    def _get_assets_status_condition(self, asset_models):
-        asset_name, model_numbers = asset_models.popitem()
-
-        def generate_asset_condition(model_number):
-            statuses = {
-                'Allocated': 0,
-                'Available': 0,
-                'Damaged': 0,
-                'Lost': 0
-            }
-
-            def increment_asset_status(asset, model_number=model_number):
-                if asset['asset_type'] == asset_name and \
-                        asset['model_number'] == model_number:
-                    nonlocal statuses
-                    statuses[asset['count_by_status']] += 1
-                return statuses
-
-            list(map(increment_asset_status, self.data))
-            return {
-                'asset_type': asset_name,
-                'model_number': model_number,
-                'count_by_status': statuses
-            }
-
-        return list(map(generate_asset_condition, model_numbers))
-
-    def _get_asset_list(self, asset):
-        asset_with_status = list(map(self._get_assets_status_condition, asset))
-        return list(chain.from_iterable(asset_with_status))
-
-    def _get_asset_type(self, asset):
-        return asset['asset_type']
-
-    def _get_model_numbers(self, asset_type):
-        asset_model_numbers = map(lambda asset: asset['model_number'], filter(
-            lambda asset: asset['asset_type'] == asset_type, self.data))
-        return {asset_type: set(list(asset_model_numbers))}
+
+    def _get_asset_health(self):
+        """
+        Read the maintained per (model number, status) asset counts,
+        filling in the statuses that have no assets
+        """
+        status_counts = AssetStatusCount.objects.filter(count__gt=0).values(
+            'model_number__make_label__asset_type__asset_type',
+            'model_number__model_number',
+            'status',
+            'count'
+        ).order_by(
+            'model_number__make_label__asset_type__asset_type',
+            'model_number__model_number'
+        )
+
+        asset_health = OrderedDict()
+        for row in status_counts:
+            key = (row['model_number__make_label__asset_type__asset_type'],
+                   row['model_number__model_number'])
+            if key not in asset_health:
+                asset_health[key] = {
+                    'asset_type': key[0],
+                    'model_number': key[1],
+                    'count_by_status': {
+                        status: 0 for status, _ in ASSET_STATUSES}
+                }
+            asset_health[key]['count_by_status'][row['status']] = \
+                row['count']
+        return list(asset_health.values())
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
         is_admin = self.request.user.is_staff
         if is_admin:
-            serializer = self.get_serializer(queryset, many=True)
-            self.data = serializer.data
-            asset_types = set(map(self._get_asset_type, self.data))
-            asset = map(self._get_model_numbers, asset_types)
-            asset_list = self._get_asset_list(asset)
-            return Response(asset_list)
+            return Response(self._get_asset_health())
         return Response(exception=True, status=403,
                         data={'detail': ['You do not have authorization']})
 
@@ -326,3 +351,29 @@ class OfficeFloorSectionViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated, IsAdminUser]
     authentication_classes = [FirebaseTokenAuthentication]
     http_method_names = ['get', 'post']
+
+
+class ImportJobViewSet(ModelViewSet):
+    serializer_class = ImportJobSerializer
+    queryset = ImportJob.objects.all()
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    authentication_classes = [FirebaseTokenAuthentication]
+    http_method_names = ['get', 'post']
+
+    def create(self, request, *args, **kwargs):
+        """Queue an uploaded csv, run_import_jobs imports it"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(created_by=request.user)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @detail_route(methods=['get'], url_path='skipped')
+    def skipped(self, request, pk=None):
+        job = self.get_object()
+        if not job.skipped_file:
+            raise Http404
+        response = FileResponse(job.skipped_file.open('rb'),
+                                content_type='text/csv')
+        response['Content-Disposition'] = \
+            'attachment; filename="import_{}_skipped.csv"'.format(job.id)
+        return response
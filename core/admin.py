@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from .forms import UserRegistrationForm
 from .models.asset import (
     AssetCategory, AssetType,
@@ -13,9 +14,13 @@ from .models.asset import (
     AssetModelNumber,
     AllocationHistory,
     AssetIncidentReport,
-    AssetSpecs)
-from .models.user import SecurityUser, UserFeedback
+    AssetSpecs,
+    LowStockAlert)
+from .models.importjob import ImportCheckpoint, ImportJob
+from .models.notification import Notification, PENDING
+from .models.user import SecurityUser, UserFeedback, UserSyncHash
 from .models.officeblock import OfficeBlock, OfficeFloorSection, OfficeFloor
+from .services import allocate_asset, change_asset_status
 
 User = get_user_model()
 
@@ -122,6 +127,13 @@ class AssetAdmin(admin.ModelAdmin):
 class AssetStatusAdmin(admin.ModelAdmin):
     list_display = ('asset', 'current_status', 'previous_status', 'created_at')
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+        asset_status = change_asset_status(obj.asset, obj.current_status)
+        obj.pk = asset_status.pk
+        obj.previous_status = asset_status.previous_status
+
 
 class UserFeedbackAdmin(admin.ModelAdmin):
     list_filter = ('report_type',)
@@ -131,6 +143,13 @@ class UserFeedbackAdmin(admin.ModelAdmin):
 class AllocationHistoryAdmin(admin.ModelAdmin):
     list_display = ('asset', 'current_owner', 'previous_owner', 'created_at')
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+        history = allocate_asset(obj.asset, obj.current_owner)
+        obj.pk = history.pk
+        obj.previous_owner_id = history.previous_owner_id
+
 
 class AssetConditionAdmin(admin.ModelAdmin):
     list_display = ('asset', 'notes', 'created_at')
@@ -140,6 +159,39 @@ class AssetLogsAdmin(admin.ModelAdmin):
     list_display = ('created_at', 'asset', 'checked_by', 'log_type')
 
 
+class NotificationAdmin(admin.ModelAdmin):
+    list_filter = ('status',)
+    list_display = ('message', 'recipient', 'status', 'attempts',
+                    'next_attempt_at', 'created_at')
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        queryset.update(status=PENDING, attempts=0,
+                        next_attempt_at=timezone.now())
+    retry.short_description = "Retry selected notifications"
+
+
+class LowStockAlertAdmin(admin.ModelAdmin):
+    list_filter = ('is_low',)
+    list_display = ('model_number', 'is_low', 'triggered_at', 'reported_at')
+
+
+class ImportJobAdmin(admin.ModelAdmin):
+    list_filter = ('import_type', 'status')
+    list_display = ('id', 'import_type', 'status', 'processed_rows',
+                    'total_rows', 'inserted', 'skipped', 'created_at')
+
+
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('import_type', 'file_hash', 'processed_rows', 'inserted',
+                    'skipped', 'updated_at')
+
+
+class UserSyncHashAdmin(admin.ModelAdmin):
+    search_fields = ('email',)
+    list_display = ('email', 'synced_at')
+
+
 class OfficeFloorAdmin(admin.ModelAdmin):
     list_filter = ('block',)
     list_display = ('number', 'block')
@@ -157,5 +209,10 @@ admin.site.register(AssetStatus, AssetStatusAdmin)
 admin.site.register(UserFeedback, UserFeedbackAdmin)
 admin.site.register(AllocationHistory, AllocationHistoryAdmin)
 admin.site.register(AssetCondition, AssetConditionAdmin)
+admin.site.register(LowStockAlert, LowStockAlertAdmin)
+admin.site.register(Notification, NotificationAdmin)
+admin.site.register(ImportJob, ImportJobAdmin)
+admin.site.register(ImportCheckpoint, ImportCheckpointAdmin)
+admin.site.register(UserSyncHash, UserSyncHashAdmin)
 admin.site.register(OfficeFloor, OfficeFloorAdmin)
 admin.site.register(OfficeFloorSection, OfficeFloorSectionAdmin)
@@ -0,0 +1,63 @@
+SKIPPED_ASSET_FIELDS = ('Count', 'Make', 'Type', 'Asset Code', 'Category',
+                        'Sub-Category', 'Model Number', 'Serial No.',
+                        'Reasons')
+
+
+def chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SkippedRows(object):
+    """
+    Rejection reasons of csv rows indexed by line number. Reasons given for
+    the same line are merged, and flush() streams the pending rows to the
+    report in line order so only unflushed rows are held in memory.
+    """
+
+    def __init__(self, writer=None):
+        self.writer = writer
+        self.pending = {}
+        self.flushed = 0
+
+    def __len__(self):
+        return self.flushed + len(self.pending)
+
+    def add(self, counter, record, reasons):
+        pending = self.pending.setdefault(
+            counter, dict(record, Count=counter, Reasons=[]))
+        pending['Reasons'].extend(reason for reason in reasons
+                                  if reason not in pending['Reasons'])
+
+    def discard(self, counters):
+        """Forget the rows of an import that was rolled back"""
+        for counter in counters:
+            self.pending.pop(counter, None)
+
+    def take(self):
+        """Remove and return the pending records in line order"""
+        records = [self.pending[counter] for counter in sorted(self.pending)]
+        self.pending = {}
+        return records
+
+    def merge(self, records):
+        for record in records:
+            self.add(record['Count'], record, record['Reasons'])
+
+    def flush(self):
+        """
+        Write the pending records to the report
+        :return: the records written, with their reasons joined
+        """
+        records = [dict(record, Reasons='; '.join(record['Reasons']))
+                   for record in self.take()]
+        self.flushed += len(records)
+        if self.writer:
+            self.writer.writerows(records)
+        return records
@@ -0,0 +1,266 @@
+from collections import Counter
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Q
+from psycopg2.extensions import TransactionRollbackError
+
+from core.importers import SkippedRows
+from core.models.asset import (
+    AssetType,
+    AssetMake,
+    Asset,
+    AssetModelNumber,
+    AssetCategory,
+    AssetStatus,
+    AssetStatusCount,
+    AssetSubCategory,
+    AVAILABLE,
+    warn_if_low_stock,
+)
+
+CHUNK_SIZE = 1000
+
+# (csv column, model, name field, parent column, parent field, label),
+# parents first. Names are normalized the way each model's clean() does.
+TAXONOMY = (
+    ('Category', AssetCategory, 'category_name',
+     None, None, 'category'),
+    ('Sub-Category', AssetSubCategory, 'sub_category_name',
+     'Category', 'asset_category_id', 'sub-category'),
+    ('Type', AssetType, 'asset_type',
+     'Sub-Category', 'asset_sub_category_id', 'asset type'),
+    ('Make', AssetMake, 'make_label',
+     'Type', 'asset_type_id', 'asset make'),
+    ('Model Number', AssetModelNumber, 'model_number',
+     'Make', 'make_label_id', 'model number'),
+)
+IDENTIFIERS = (
+    ('Asset Code', 'asset_code'),
+    ('Serial No.', 'serial_number'),
+)
+
+
+class Conflict(Exception):
+    """An import rolled back by rows written concurrently"""
+
+
+def is_conflict(error):
+    """Whether a database error was a unique violation or a deadlock"""
+    return isinstance(error, IntegrityError) or \
+        isinstance(error.__cause__, TransactionRollbackError)
+
+
+def _normalize(column, value):
+    value = (value or '').strip()
+    if column in ('Model Number', 'Asset Code', 'Serial No.'):
+        return value.upper()
+    return value.title()
+
+
+def _max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def check_values(values):
+    """Return the reasons a normalized csv row cannot be imported"""
+    reasons = ['{} has no value'.format(label)
+               for column, _, _, _, _, label in TAXONOMY
+               if not values[column]]
+    if not (values['Asset Code'] or values['Serial No.']):
+        reasons.append('asset must have either asset code or serial number')
+    columns = [(column, model, field)
+               for column, model, field, _, _, _ in TAXONOMY] + \
+        [(column, Asset, field) for column, field in IDENTIFIERS]
+    reasons.extend(
+        '{} {} is longer than {} characters'.format(
+            column, values[column], _max_length(model, field))
+        for column, model, field in columns
+        if len(values[column]) > _max_length(model, field))
+    return reasons
+
+
+class AssetImport(object):
+    """
+    Single pass asset csv import. Existing taxonomy names are loaded once
+    into maps, and each chunk of rows creates its missing taxonomy, its
+    assets and their initial statuses with a few bulk queries.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, skipped_rows=None):
+        self.chunk_size = chunk_size
+        self.load_taxonomy()
+        self.inserted = 0
+        self.skipped_rows = SkippedRows() if skipped_rows is None \
+            else skipped_rows
+
+    def load_taxonomy(self):
+        self.ids = {
+            column: dict(model.objects.values_list(field, 'id'))
+            for column, model, field, _, _, _ in TAXONOMY
+        }
+
+    def skip(self, counter, row, reasons):
+        record = {column: row.get(column)
+                  for column, _, _, _, _, _ in TAXONOMY}
+        record.update({column: row.get(column)
+                       for column, _ in IDENTIFIERS})
+        self.skipped_rows.add(counter, record, reasons)
+
+    def create_taxonomy(self, rows):
+        """Bulk create the taxonomy names of the rows that do not exist"""
+        for column, model, field, parent, parent_field, _ in TAXONOMY:
+            missing = {}
+            for values in rows:
+                if values[column] not in self.ids[column]:
+                    missing.setdefault(values[column], values[parent]
+                                       if parent else None)
+            created = model.objects.bulk_create(
+                model(**dict({field: name},
+                             **({parent_field: self.ids[parent][parent_name]}
+                                if parent else {})))
+                for name, parent_name in sorted(missing.items()))
+            self.ids[column].update(
+                (getattr(instance, field), instance.id)
+                for instance in created)
+
+    def existing_identifiers(self, rows):
+        codes = [values['Asset Code'] for values in rows
+                 if values['Asset Code']]
+        serials = [values['Serial No.'] for values in rows
+                   if values['Serial No.']]
+        existing = Asset.objects.filter(
+            Q(asset_code__in=codes) | Q(serial_number__in=serials)
+        ).values_list('asset_code', 'serial_number')
+        return {('Asset Code', code) for code, _ in existing} | \
+            {('Serial No.', serial) for _, serial in existing}
+
+    def duplicate_reasons(self, values, seen):
+        """
+        Reasons a row repeats an identifier already stored or imported. The
+        identifiers of a row are only marked as seen when it is imported,
+        so a skipped row does not reject later rows sharing one of them.
+        """
+        keys = [(column, values[column]) for column, _ in IDENTIFIERS
+                if values[column]]
+        reasons = ['{0} {1} already exists.'.format(dict(IDENTIFIERS)[column],
+                                                    value)
+                   for column, value in keys if (column, value) in seen]
+        if not reasons:
+            seen.update(keys)
+        return reasons
+
+    def create_assets(self, rows):
+        """Bulk create the assets of valid rows as available"""
+        assets = Asset.objects.bulk_create(
+            Asset(asset_code=values['Asset Code'] or None,
+                  serial_number=values['Serial No.'] or None,
+                  model_number_id=self.ids['Model Number'][
+                      values['Model Number']],
+                  current_status=AVAILABLE)
+            for _, _, values in rows)
+        AssetStatus.objects.bulk_create(
+            AssetStatus(asset=asset, current_status=AVAILABLE)
+            for asset in assets)
+        # counters are locked in model number order so parallel imports
+        # cannot deadlock on them
+        per_model = Counter(asset.model_number_id for asset in assets)
+        for model_number_id, total in sorted(per_model.items()):
+            AssetStatusCount.adjust(model_number_id, AVAILABLE, total)
+        for model_number in AssetModelNumber.objects.filter(
+                pk__in=per_model).order_by('pk'):
+            warn_if_low_stock(model_number)
+        self.inserted += len(assets)
+
+    def import_chunk(self, chunk):
+        """
+        Import a list of (line counter, csv row) in one transaction. When
+        it conflicts with rows committed meanwhile by another import, the
+        chunk is retried against fresh data and then row by row, leaving
+        the unique constraints to reject duplicates.
+        """
+        for _ in range(2):
+            try:
+                return self._attempt(chunk)
+            except Conflict:
+                continue
+        for counter, row in chunk:
+            self._import_row(counter, row)
+
+    def _attempt(self, chunk):
+        """Import rows, forgetting their results when rolled back"""
+        mark = self.inserted
+        try:
+            self._import_chunk(chunk)
+        except DatabaseError as e:
+            self.inserted = mark
+            self.skipped_rows.discard(counter for counter, _ in chunk)
+            self.load_taxonomy()
+            if is_conflict(e):
+                raise Conflict(e)
+            raise
+
+    def _import_row(self, counter, row):
+        try:
+            self._attempt([(counter, row)])
+        except Conflict as e:
+            self.skip(counter, row,
+                      ['unable to save asset: {}'.format(e).strip()])
+
+    @transaction.atomic
+    def _import_chunk(self, chunk):
+        rows = []
+        for counter, row in chunk:
+            values = {column: _normalize(column, row.get(column))
+                      for column in [level[0] for level in TAXONOMY] +
+                      [column for column, _ in IDENTIFIERS]}
+            reasons = check_values(values)
+            if reasons:
+                self.skip(counter, row, reasons)
+            else:
+                rows.append((counter, row, values))
+        self.create_taxonomy([values for _, _, values in rows])
+
+        seen = self.existing_identifiers([values for _, _, values in rows])
+        valid = []
+        for counter, row, values in rows:
+            reasons = self.duplicate_reasons(values, seen)
+            if reasons:
+                self.skip(counter, row, reasons)
+            else:
+                valid.append((counter, row, values))
+        self.create_assets(valid)
+
+    def merge(self, inserted, skipped_rows):
+        """Add the results of a chunk imported by a pool worker"""
+        self.inserted += inserted
+        self.skipped_rows.merge(skipped_rows)
+
+
+class DryRunImport(AssetImport):
+    """
+    Asset import that checks a file without writing. Existing identifiers
+    are loaded once into a set which stands in for the assets table, so
+    rows are skipped for the same reasons as in a real import.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, skipped_rows=None):
+        super().__init__(chunk_size, skipped_rows)
+        self.identifiers = set()
+        for code, serial in Asset.objects.values_list(
+                'asset_code', 'serial_number').iterator():
+            self.identifiers.update(
+                [('Asset Code', code), ('Serial No.', serial)])
+
+    def create_taxonomy(self, rows):
+        """Missing taxonomy would be created, so it rejects no row"""
+
+    def existing_identifiers(self, rows):
+        return {(column, values[column]) for values in rows
+                for column, _ in IDENTIFIERS} & self.identifiers
+
+    def create_assets(self, rows):
+        for _, _, values in rows:
+            self.identifiers.update((column, values[column])
+                                    for column, _ in IDENTIFIERS
+                                    if values[column])
+        self.inserted += len(rows)
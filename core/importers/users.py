@@ -0,0 +1,249 @@
+import hashlib
+import json
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from core.importers import SkippedRows
+from core.models.user import User, UserSyncHash
+
+USER_FIELDS = [
+    'first_name', 'last_name', 'email',
+    'cohort', 'picture', 'phone_number'
+]
+# fields of existing users refreshed by an import with update
+UPDATE_FIELDS = ['cohort', 'picture', 'phone_number']
+CHUNK_SIZE = 1000
+
+
+def _normalize(row):
+    values = {}
+    for attr in USER_FIELDS:
+        value = row.get(attr)
+        if value is not None:
+            value = str(value).strip() or None
+        values[attr] = value
+    if values['email']:
+        values['email'] = User.objects.normalize_email(values['email'])
+    return values
+
+
+def _email_key(row):
+    """Lower cased email of a row, which identifies its user"""
+    return str(row.get('email') or '').strip().lower()
+
+
+def _max_length(attr):
+    return User._meta.get_field(attr).max_length
+
+
+def check_values(values):
+    """Return the reasons a normalized row cannot be imported"""
+    reasons = [] if values['email'] else ['email has no value']
+    if values['cohort'] is not None:
+        try:
+            values['cohort'] = int(values['cohort'])
+        except ValueError:
+            reasons.append('cohort {} is not a number'.format(
+                values['cohort']))
+    reasons.extend(
+        '{} {} is longer than {} characters'.format(
+            attr, values[attr], _max_length(attr))
+        for attr in USER_FIELDS
+        if _max_length(attr) and values[attr] and
+        len(values[attr]) > _max_length(attr))
+    return reasons
+
+
+class UserImport(object):
+    """
+    Bulk user import. Existing users are loaded once into a map keyed by
+    lower cased email, incoming rows are normalized and deduped in memory
+    and each chunk creates its new users with one bulk query. Without
+    preload, only the users of each chunk are loaded and rows are deduped
+    within their chunk, so memory does not grow with the import.
+    """
+
+    def __init__(self, update=False, dry_run=False, preload=True):
+        self.update = update
+        self.dry_run = dry_run
+        self.preload = preload
+        self.existing = self.load_existing() if preload else {}
+        self.seen = set()
+        self.inserted = 0
+        self.updated = 0
+        self.skipped_rows = SkippedRows()
+
+    @staticmethod
+    def load_existing(emails=None):
+        """
+        Map lower cased emails to (email, id, *UPDATE_FIELDS) of the
+        existing users, or of those with the given lower cased emails
+        """
+        users = User.objects.values_list('email', 'id', *UPDATE_FIELDS)
+        if emails is not None:
+            users = users.annotate(key=Lower('email')).filter(key__in=emails)
+        return {user[0].lower(): user for user in users.iterator()}
+
+    def skip(self, counter, row, reasons):
+        self.skipped_rows.add(
+            counter, {attr: row.get(attr) for attr in USER_FIELDS}, reasons)
+
+    def flush_skipped(self):
+        """Take the skipped rows, keyed by email for display_skipped"""
+        return {record['email'] or 'row_{}'.format(record['Count']):
+                [record['Reasons'], record['Count']]
+                for record in self.skipped_rows.flush()}
+
+    def changes(self, values):
+        """Fields of an existing user that a row gives a new value"""
+        existing = dict(zip(UPDATE_FIELDS,
+                            self.existing[values['email'].lower()][2:]))
+        return {attr: values[attr] for attr in UPDATE_FIELDS
+                if values[attr] is not None and
+                values[attr] != existing[attr]}
+
+    def import_chunk(self, chunk):
+        """
+        Import a list of (line counter, row)
+        :return: the counters of the rows the stored users now match, i.e.
+        those created, updated or of an existing user left unchanged
+        """
+        new, changed, current = [], [], []
+        if not self.preload:
+            self.existing = self.load_existing(
+                {_email_key(row) for _, row in chunk})
+            self.seen = set()
+        for counter, row in chunk:
+            values = _normalize(row)
+            reasons = check_values(values) or \
+                self.duplicate_reasons(counter, values, changed, current)
+            if reasons:
+                self.skip(counter, row, reasons)
+            elif values['email'].lower() not in self.existing:
+                new.append((counter, values))
+        created = self.create_users(new)
+        self.update_users(changed)
+        return {counter for counter, _ in created} | \
+            {counter for counter, _, _ in changed} | set(current)
+
+    def duplicate_reasons(self, counter, values, changed, current):
+        """
+        Say why a row whose email was already seen or stored is skipped,
+        queueing the changes of an existing user to update instead and
+        noting the counter of one that is already up to date
+        """
+        key = values['email'].lower()
+        duplicate = key in self.seen
+        self.seen.add(key)
+        reasons = ["User {} already exists".format(values['email'])]
+        if duplicate:
+            return reasons
+        if key not in self.existing:
+            return []
+        if not self.update:
+            return reasons
+        changes = self.changes(values)
+        if changes:
+            changed.append((counter, values, changes))
+            return []
+        current.append(counter)
+        return reasons
+
+    def create_users(self, rows):
+        if not self.dry_run:
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create(
+                        User(**values) for _, values in rows)
+            except IntegrityError:
+                # users created meanwhile, let the database reject them
+                rows = [(counter, values) for counter, values in rows
+                        if self.create_user(counter, values)]
+        self.inserted += len(rows)
+        return rows
+
+    def create_user(self, counter, values):
+        try:
+            with transaction.atomic():
+                User.objects.create(**values)
+        except IntegrityError:
+            self.skip(counter, values,
+                      ["User {} already exists".format(values['email'])])
+            return False
+        return True
+
+    def update_users(self, rows):
+        """Update the changed fields of existing users in one query"""
+        ids = {counter: self.existing[values['email'].lower()][1]
+               for counter, values, _ in rows}
+        updates = {
+            attr: Case(*[When(pk=ids[counter], then=Value(changes[attr]))
+                         for counter, _, changes in rows
+                         if attr in changes],
+                       default=attr,
+                       output_field=User._meta.get_field(attr))
+            for attr in UPDATE_FIELDS
+        }
+        if rows and not self.dry_run:
+            User.objects.filter(pk__in=ids.values()).update(
+                last_modified=timezone.now(), **updates)
+        self.updated += len(rows)
+
+
+def record_hash(record):
+    """Hash of the fields of a remote user record that are imported"""
+    return hashlib.sha256(json.dumps(
+        [record.get(attr) for attr in USER_FIELDS], default=str
+    ).encode()).hexdigest()
+
+
+class UserSync(object):
+    """
+    Incremental sync of users from a remote directory. The hash of each
+    record synced is stored, and records whose hash did not change since
+    the last sync are skipped without being checked or written. Hashes and
+    users are looked up chunk by chunk, so memory stays constant.
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.user_import = UserImport(update=True, dry_run=dry_run,
+                                      preload=False)
+        self.unchanged = 0
+
+    def sync_chunk(self, chunk):
+        """Import the changed records of a list of (counter, record)"""
+        stored = dict(UserSyncHash.objects.filter(
+            email__in={_email_key(record) for _, record in chunk}
+        ).values_list('email', 'content_hash'))
+        changed, hashes = [], {}
+        for counter, record in chunk:
+            email = _email_key(record)
+            content_hash = record_hash(record)
+            if stored.get(email) == content_hash:
+                self.unchanged += 1
+                continue
+            changed.append((counter, record))
+            hashes[counter] = (email, content_hash)
+        # rows the import skipped keep no hash, so the next sync retries
+        synced = self.user_import.import_chunk(changed)
+        if not self.dry_run:
+            self.save_hashes(dict(hashes[counter] for counter in synced),
+                             stored)
+
+    def save_hashes(self, hashes, stored):
+        """Store the hashes of synced emails, given those already stored"""
+        UserSyncHash.objects.bulk_create(
+            UserSyncHash(email=email, content_hash=hashes[email])
+            for email in hashes if email not in stored)
+        changed = [email for email in hashes if email in stored]
+        if changed:
+            UserSyncHash.objects.filter(email__in=changed).update(
+                synced_at=timezone.now(), content_hash=Case(
+                    *[When(email=email, then=Value(hashes[email]))
+                      for email in changed],
+                    output_field=UserSyncHash._meta.get_field(
+                        'content_hash')))
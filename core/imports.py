@@ -0,0 +1,127 @@
+import codecs
+import csv
+import tempfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from core.models.importjob import (
+    ImportJob, ASSETS, USERS, COMPLETED, FAILED, QUEUED, RUNNING
+)
+from core.importers import SKIPPED_ASSET_FIELDS, chunks
+from core.importers.assets import AssetImport
+from core.importers.users import USER_FIELDS, UserImport
+
+SKIPPED_USER_FIELDS = ['Count'] + USER_FIELDS + ['Reasons']
+# a running job whose last chunk finished longer ago has lost its worker
+JOB_TIMEOUT = 1800
+
+
+def asset_importer():
+    """Return a function importing a chunk of asset rows"""
+    asset_import = AssetImport()
+
+    def import_chunk(chunk):
+        inserted = asset_import.inserted
+        asset_import.import_chunk(chunk)
+        return (asset_import.inserted - inserted,
+                asset_import.skipped_rows.flush())
+    return import_chunk
+
+
+def user_importer():
+    """Return a function importing a chunk of user rows"""
+    user_import = UserImport()
+
+    def import_chunk(chunk):
+        inserted = user_import.inserted
+        user_import.import_chunk(chunk)
+        return (user_import.inserted - inserted,
+                user_import.skipped_rows.flush())
+    return import_chunk
+
+
+IMPORTERS = {
+    ASSETS: (asset_importer, SKIPPED_ASSET_FIELDS),
+    USERS: (user_importer, SKIPPED_USER_FIELDS),
+}
+
+
+def _rows(job):
+    with job.file.open('rb') as f:
+        yield from enumerate(csv.DictReader(
+            codecs.iterdecode(f, 'utf-8-sig')), 1)
+
+
+def _count_rows(job):
+    with job.file.open('rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def run_job(job):
+    """Import the rows of a job chunk by chunk, recording its progress"""
+    make_importer, fieldnames = IMPORTERS[job.import_type]
+    import_chunk = make_importer()
+    ImportJob.objects.filter(pk=job.pk).update(total_rows=_count_rows(job))
+    with tempfile.TemporaryFile('w+') as report:
+        writer = csv.DictWriter(report, fieldnames=fieldnames)
+        writer.writeheader()
+        for chunk in chunks(_rows(job), 1000):
+            inserted, skipped_rows = import_chunk(chunk)
+            writer.writerows(skipped_rows)
+            job.add_progress(len(chunk), inserted, len(skipped_rows))
+        if job.skipped:
+            report.seek(0)
+            job.skipped_file.save('import_{}_skipped.csv'.format(job.id),
+                                  File(report), save=False)
+
+
+def fail_stale_jobs(now):
+    """
+    Fail the running jobs whose worker stopped reporting progress, e.g.
+    because it was killed mid-import, so they do not stay running forever
+    :return: the number of failed jobs
+    """
+    return ImportJob.objects.filter(
+        status=RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=JOB_TIMEOUT)
+    ).update(status=FAILED, finished_at=now,
+             error='The import stopped responding; upload the file again.')
+
+
+@transaction.atomic
+def claim_next_job():
+    """Mark the oldest queued job as running so no other worker takes it"""
+    now = timezone.now()
+    fail_stale_jobs(now)
+    job = ImportJob.objects.select_for_update(skip_locked=True).filter(
+        status=QUEUED).order_by('id').first()
+    if job:
+        job.status = RUNNING
+        job.started_at = job.heartbeat_at = now
+        job.save()
+    return job
+
+
+def run_next_job():
+    """
+    Run the oldest queued import job
+    :return: the finished job or None when there is nothing to run
+    """
+    job = claim_next_job()
+    if not job:
+        return None
+    try:
+        run_job(job)
+    except Exception as err:
+        job.status, job.error = FAILED, str(err)
+    else:
+        job.status = COMPLETED
+    job.finished_at = timezone.now()
+    # a job failed as stale meanwhile keeps its failure
+    ImportJob.objects.filter(pk=job.pk, status=RUNNING).update(
+        status=job.status, error=job.error, finished_at=job.finished_at,
+        skipped_file=job.skipped_file.name)
+    return job
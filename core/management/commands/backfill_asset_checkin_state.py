@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.models import AssetLog
+
+
+class Command(BaseCommand):
+    help = 'Store the latest check-in state of every asset from its logs'
+
+    def handle(self, *args, **options):
+        updated = AssetLog.rebuild_asset_checkin_state()
+        self.stdout.write(self.style.SUCCESS(
+            'Updated the check-in state of {} assets'.format(updated)))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.models import AssetStatusCount
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per model number asset status counts from assets'
+
+    def handle(self, *args, **options):
+        counters = AssetStatusCount.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt {} asset status counters'.format(len(counters))))
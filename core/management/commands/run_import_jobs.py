@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.imports import run_next_job
+
+
+class Command(BaseCommand):
+    help = 'Run the csv import jobs queued through the API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait when no job is queued')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the queued jobs and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            job = run_next_job()
+            if job:
+                self.stdout.write('{}: {} inserted, {} skipped'.format(
+                    job, job.inserted, job.skipped))
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
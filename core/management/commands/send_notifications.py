@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.notifications import deliver_pending, queue_low_stock_digest
+
+
+class Command(BaseCommand):
+    help = ('Deliver queued Slack notifications from the outbox and queue '
+            'the periodic low stock digest')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the due notifications and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            queue_low_stock_digest()
+            processed = deliver_pending(options['batch_size'])
+            if processed:
+                self.stdout.write('Processed {} notifications'.format(
+                    processed))
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
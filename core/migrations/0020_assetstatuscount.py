@@ -0,0 +1,49 @@
+# Generated by Django 2.0.1 on 2026-10-18 03:39
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def populate_asset_status_counts(apps, schema_editor):
+    Asset = apps.get_model('core', 'Asset')
+    AssetStatusCount = apps.get_model('core', 'AssetStatusCount')
+    totals = Asset.objects.filter(
+        model_number__isnull=False,
+        current_status__in=['Available', 'Allocated', 'Lost', 'Damaged']
+    ).values('model_number', 'current_status').annotate(
+        total=Count('id')).order_by()
+    AssetStatusCount.objects.bulk_create(
+        AssetStatusCount(model_number_id=row['model_number'],
+                         status=row['current_status'],
+                         count=row['total'])
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_asset_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetStatusCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Available', 'Available'), ('Allocated', 'Allocated'), ('Lost', 'Lost'), ('Damaged', 'Damaged')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('model_number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.AssetModelNumber')),
+            ],
+            options={
+                'verbose_name': 'Asset Status Count',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='assetstatuscount',
+            unique_together={('model_number', 'status')},
+        ),
+        migrations.RunPython(populate_asset_status_counts,
+                             migrations.RunPython.noop),
+    ]
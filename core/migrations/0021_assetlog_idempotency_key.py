@@ -0,0 +1,23 @@
+# Generated by Django 2.0.1 on 2026-10-18 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_assetstatuscount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetlog',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='assetlog',
+            name='scanned_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
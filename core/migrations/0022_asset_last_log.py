@@ -0,0 +1,35 @@
+# Generated by Django 2.0.1 on 2026-10-18 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_assetlog_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='last_log_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='last_log_type',
+            field=models.CharField(blank=True, choices=[('Checkin', 'Checkin'), ('Checkout', 'Checkout')], editable=False, max_length=10, null=True),
+        ),
+        migrations.RunSQL("""
+            UPDATE core_asset SET last_log_type = latest.log_type,
+                                  last_log_at = latest.created_at
+            FROM (
+                SELECT asset_id, log_type, created_at,
+                       ROW_NUMBER() OVER (PARTITION BY asset_id
+                                          ORDER BY created_at DESC, id DESC)
+                           AS rank
+                FROM core_assetlog
+            ) AS latest
+            WHERE latest.rank = 1 AND core_asset.id = latest.asset_id
+        """, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.0.1 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_asset_last_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlackUserId',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=100, unique=True)),
+                ('slack_id', models.CharField(max_length=50)),
+                ('refreshed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.0.1 on 2026-10-18 04:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_low', models.BooleanField(default=False)),
+                ('triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('reported_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Low Stock Alert',
+            },
+        ),
+        migrations.AddField(
+            model_name='assetmodelnumber',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(default=10, help_text='Alert when this many or fewer assets are available'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='model_number',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='core.AssetModelNumber'),
+        ),
+    ]
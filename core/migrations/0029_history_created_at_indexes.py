@@ -0,0 +1,29 @@
+# Generated by Django 2.0.1 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_usersynchash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='allocationhistory',
+            index=models.Index(fields=['created_at', 'id'], name='core_alloca_created_46c828_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assetcondition',
+            index=models.Index(fields=['created_at', 'id'], name='core_assetc_created_453292_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assetlog',
+            index=models.Index(fields=['created_at', 'id'], name='core_assetl_created_ded1e5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assetstatus',
+            index=models.Index(fields=['created_at', 'id'], name='core_assets_created_968a21_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.0.1 on 2026-10-18 06:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_history_created_at_indexes'),
+    ]
+
+    operations = [
+        # order the stored check-in state by scan time, as AssetLog does now
+        migrations.RunSQL("""
+            UPDATE core_asset SET last_log_type = latest.log_type,
+                                  last_log_at = latest.logged_at
+            FROM (
+                SELECT asset_id, log_type,
+                       LEAST(scanned_at, created_at) AS logged_at,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY asset_id
+                           ORDER BY LEAST(scanned_at, created_at) DESC,
+                                    id DESC) AS rank
+                FROM core_assetlog
+            ) AS latest
+            WHERE latest.rank = 1 AND core_asset.id = latest.asset_id
+        """, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.0.1 on 2026-10-18 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_asset_last_log_scanned_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # jobs already running count from their start
+        migrations.RunSQL(
+            "UPDATE core_importjob SET heartbeat_at = started_at "
+            "WHERE status = 'Running'", migrations.RunSQL.noop),
+    ]
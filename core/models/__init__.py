@@ -1,3 +1,5 @@
 from .user import *  # noqa: F403,F401
 from .asset import *  # noqa: F403,F401
 from .officeblock import *  # noqa: F403,F401
+from .notification import *  # noqa: F403,F401
+from .importjob import *  # noqa: F403,F401
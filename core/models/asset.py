@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from datetime import datetime
 
+from .notification import Notification
 from .user import SecurityUser
 from core.slack_bot import SlackIntegration
 from core.validator import validate_date
@@ -185,6 +188,9 @@ class AssetModelNumber(models.Model):
                                    null=True,
                                    on_delete=models.PROTECT,
                                    verbose_name="Asset Make")
+    low_stock_threshold = models.PositiveIntegerField(
+        default=10,
+        help_text="Alert when this many or fewer assets are available")
 
     def clean(self):
         self.model_number = self.model_number.upper()
@@ -267,6 +273,12 @@ class Asset(models.Model):
         on_delete=models.PROTECT
     )
     verified = models.BooleanField(default=True)
+    last_log_type = models.CharField(max_length=10,
+                                     blank=True,
+                                     null=True,
+                                     editable=False,
+                                     choices=LOG_TYPE_CHOICES)
+    last_log_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def clean(self):
         if not self.asset_code and not self.serial_number:
@@ -290,7 +302,18 @@ class Asset(models.Model):
         are provided and an existing status is given
         """
         self.full_clean()
-        super(Asset, self).save(*args, **kwargs)
+        with transaction.atomic():
+            stored = Asset.objects.select_for_update().filter(
+                pk=self.pk).values_list(
+                'model_number_id', 'current_status',
+                'last_log_type', 'last_log_at').first()
+            if stored:
+                # check-in state is only written by AssetLog, keep it fresh
+                self.last_log_type, self.last_log_at = stored[2:]
+            AssetStatusCount.record_change(
+                stored and stored[:2],
+                (self.model_number_id, self.current_status))
+            super(Asset, self).save(*args, **kwargs)
 
     def __str__(self):
         return '{}, {}, {}'.format(self.asset_code,
@@ -301,6 +324,132 @@ class Asset(models.Model):
         ordering = ['-id']
 
 
+class AssetStatusCount(models.Model):
+    """Running count of assets per model number and status"""
+    model_number = models.ForeignKey(AssetModelNumber,
+                                     on_delete=models.CASCADE)
+    status = models.CharField(max_length=50, choices=ASSET_STATUSES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Asset Status Count"
+        unique_together = ("model_number", "status")
+
+    def __str__(self):
+        return "{}: {} {}".format(self.model_number_id, self.count,
+                                  self.status)
+
+    @classmethod
+    def adjust(cls, model_number_id, status, delta):
+        """Add delta to the counter, creating it the first time it is used"""
+        if not model_number_id or not status:
+            return
+        counters = cls.objects.filter(
+            model_number_id=model_number_id, status=status)
+        if delta < 0:
+            counters.filter(count__gte=-delta).update(
+                count=F('count') + delta)
+        elif not counters.update(count=F('count') + delta):
+            _, created = cls.objects.get_or_create(
+                model_number_id=model_number_id, status=status,
+                defaults={'count': delta})
+            if not created:
+                counters.update(count=F('count') + delta)
+
+    @classmethod
+    def record_change(cls, previous_state, current_state):
+        """
+        Move an asset between counters when its model number or status
+        changes
+        """
+        if previous_state == current_state:
+            return
+        if previous_state:
+            cls.adjust(*previous_state, -1)
+        cls.adjust(*current_state, 1)
+
+    @classmethod
+    def get_count(cls, model_number, status):
+        return cls.objects.filter(
+            model_number=model_number, status=status
+        ).values_list('count', flat=True).first() or 0
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every counter from the assets in one aggregated pass"""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('LOCK TABLE {} IN SHARE MODE'.format(
+                    Asset._meta.db_table))
+            cls.objects.all().delete()
+            totals = Asset.objects.filter(
+                model_number__isnull=False,
+                current_status__in=[status for status, _ in ASSET_STATUSES]
+            ).values('model_number', 'current_status').annotate(
+                total=Count('id')).order_by()
+            return cls.objects.bulk_create(
+                cls(model_number_id=row['model_number'],
+                    status=row['current_status'],
+                    count=row['total'])
+                for row in totals
+            )
+
+
+class LowStockAlert(models.Model):
+    """
+    Low stock state of a model number. It only flips when the available
+    count crosses the model's threshold so each shortage is reported once.
+    """
+    model_number = models.OneToOneField(AssetModelNumber,
+                                        on_delete=models.CASCADE)
+    is_low = models.BooleanField(default=False)
+    triggered_at = models.DateTimeField(blank=True, null=True)
+    reported_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Low Stock Alert"
+
+    def __str__(self):
+        return '{} {}'.format(self.model_number,
+                              'low' if self.is_low else 'in stock')
+
+    @classmethod
+    def record_level(cls, model_number, available):
+        """
+        Flip the alert of a model number when its available count crosses
+        the threshold, leaving it untouched otherwise
+        """
+        is_low = available <= model_number.low_stock_threshold
+        triggered_at = timezone.now() if is_low else None
+        alert, created = cls.objects.get_or_create(
+            model_number=model_number,
+            defaults={'is_low': is_low, 'triggered_at': triggered_at})
+        if created or alert.is_low == is_low:
+            return
+        fields = {'is_low': is_low}
+        if is_low:
+            fields['triggered_at'] = triggered_at
+        # conditional so only one concurrent writer flips the state
+        cls.objects.filter(pk=alert.pk, is_low=not is_low).update(**fields)
+
+
+# a log's time is when it was scanned, bounded by when it was recorded
+# (LEAST ignores a missing scanned_at)
+CHECKIN_STATE_SQL = """
+    UPDATE {asset} SET last_log_type = latest.log_type,
+                       last_log_at = latest.logged_at
+    FROM (
+        SELECT asset_id, log_type,
+               LEAST(scanned_at, created_at) AS logged_at,
+               ROW_NUMBER() OVER (PARTITION BY asset_id
+                                  ORDER BY LEAST(scanned_at, created_at) DESC,
+                                           id DESC) AS rank
+        FROM {asset_log}
+    ) AS latest
+    WHERE latest.rank = 1 AND {asset}.id = latest.asset_id
+"""
+
+
 class AssetLog(models.Model):
     """Stores checkin/Checkout asset logs"""
     asset = models.ForeignKey(Asset,
@@ -312,6 +461,12 @@ class AssetLog(models.Model):
     log_type = models.CharField(max_length=10,
                                 blank=False,
                                 choices=LOG_TYPE_CHOICES)
+    idempotency_key = models.CharField(max_length=64,
+                                       unique=True,
+                                       null=True,
+                                       blank=True,
+                                       editable=False)
+    scanned_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     last_modified = models.DateTimeField(auto_now=True, editable=False)
 
@@ -321,11 +476,65 @@ class AssetLog(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                AssetLog.update_asset_checkin_state([self])
+
+    @property
+    def logged_at(self):
+        """
+        When the asset went through the gate: the device's scan time, or
+        when the log was recorded if the device sent none or a later time
+        """
+        if self.scanned_at:
+            return min(self.scanned_at, self.created_at)
+        return self.created_at
+
+    @staticmethod
+    def update_asset_checkin_state(logs):
+        """
+        Store the type and time of the latest given log on each asset,
+        leaving assets whose stored state is newer untouched so scans
+        uploaded late or out of order never roll it back
+        """
+        latest_logs = {}
+        for log in sorted(logs, key=lambda log: (log.logged_at, log.id)):
+            latest_logs[log.asset_id] = log
+        if not latest_logs:
+            return
+        older_state = Q()
+        for asset_id, log in latest_logs.items():
+            older_state |= Q(pk=asset_id) & (
+                Q(last_log_at__isnull=True) |
+                Q(last_log_at__lte=log.logged_at))
+        Asset.objects.filter(older_state).update(
+            last_log_type=Case(
+                *[When(pk=asset_id, then=Value(log.log_type))
+                  for asset_id, log in latest_logs.items()],
+                output_field=models.CharField()),
+            last_log_at=Case(
+                *[When(pk=asset_id, then=Value(log.logged_at))
+                  for asset_id, log in latest_logs.items()],
+                output_field=models.DateTimeField()))
+
+    @classmethod
+    def rebuild_asset_checkin_state(cls):
+        """
+        Recompute every asset's latest check-in state from its logs in one
+        windowed query and return the number of assets updated
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                CHECKIN_STATE_SQL.format(asset=Asset._meta.db_table,
+                                         asset_log=cls._meta.db_table))
+            return cursor.rowcount
 
     class Meta:
         verbose_name = "Asset Log"
         ordering = ['-id']
+        indexes = [models.Index(fields=['created_at', 'id'])]
 
 
 class AssetStatus(models.Model):
@@ -343,6 +552,7 @@ class AssetStatus(models.Model):
     class Meta:
         verbose_name_plural = 'Asset Statuses'
         ordering = ['-id']
+        indexes = [models.Index(fields=['created_at', 'id'])]
 
     def save(self, *args, **kwargs):
         try:
@@ -375,6 +585,7 @@ class AllocationHistory(models.Model):
     class Meta:
         verbose_name_plural = "Allocation History"
         ordering = ['-id']
+        indexes = [models.Index(fields=['created_at', 'id'])]
 
     def clean(self):
         if self.asset.current_status != AVAILABLE:
@@ -404,6 +615,7 @@ class AssetCondition(models.Model):
     class Meta:
         verbose_name_plural = 'Asset Condition'
         ordering = ['-id']
+        indexes = [models.Index(fields=['created_at', 'id'])]
 
     def save(self, *args, **kwargs):
         super(AssetCondition, self).save(*args, **kwargs)
@@ -457,14 +669,13 @@ def set_current_asset_status(sender, **kwargs):
 def check_asset_limit(sender, **kwargs):
     """Check the assets have not exceeded the limit"""
     asset_status = kwargs.get('instance')
-    model_number = asset_status.asset.model_number
-    available_assets = Asset.objects.filter(
-        current_status='Available', model_number=model_number
-    ).count()
-    if available_assets <= 10:
-        message = "Warning!! The number of available {} ".format(
-            model_number) + " is {}".format(available_assets)
-        slack.send_message(message)
+    warn_if_low_stock(asset_status.asset.model_number)
+
+
+def warn_if_low_stock(model_number):
+    """Raise or clear the low stock alert of a model number"""
+    available_assets = AssetStatusCount.get_count(model_number, AVAILABLE)
+    LowStockAlert.record_level(model_number, available_assets)
 
 
 @receiver(post_save, sender=Asset)
@@ -478,6 +689,12 @@ def save_initial_asset_status(sender, **kwargs):
         current_asset.save()
 
 
+@receiver(post_delete, sender=Asset)
+def remove_deleted_asset_count(sender, **kwargs):
+    asset = kwargs.get('instance')
+    AssetStatusCount.adjust(asset.model_number_id, asset.current_status, -1)
+
+
 @receiver(post_save, sender=AssetCondition)
 def save_notes(sender, **kwargs):
     new_condition = kwargs.get('instance')
@@ -500,7 +717,7 @@ def allocation_history_post_save(sender, **kwargs):
     if asset.assigned_to and asset.current_status == AVAILABLE:
         message = "The asset with serial number {} ".format(
             asset.serial_number) + "has been allocated to you."
-        slack.send_message(message, user=user)
+        Notification.enqueue(message, recipient=user)
         asset_status = AssetStatus.objects.create(
             asset=asset,
             current_status=ALLOCATED
@@ -0,0 +1,99 @@
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from .user import User
+
+ASSETS = "assets"
+USERS = "users"
+
+IMPORT_TYPES = (
+    (ASSETS, "Assets"),
+    (USERS, "Users"),
+)
+
+QUEUED = "Queued"
+RUNNING = "Running"
+COMPLETED = "Completed"
+FAILED = "Failed"
+
+IMPORT_STATUSES = (
+    (QUEUED, "Queued"),
+    (RUNNING, "Running"),
+    (COMPLETED, "Completed"),
+    (FAILED, "Failed"),
+)
+
+
+class ImportProgress(models.Model):
+    """Rows of a csv import processed so far"""
+    import_type = models.CharField(max_length=10, choices=IMPORT_TYPES)
+    processed_rows = models.PositiveIntegerField(default=0)
+    inserted = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def add_progress(self, processed, inserted, skipped):
+        """Add the results of an imported chunk of rows"""
+        type(self).objects.filter(pk=self.pk).update(
+            processed_rows=F('processed_rows') + processed,
+            inserted=F('inserted') + inserted,
+            skipped=F('skipped') + skipped)
+        self.processed_rows += processed
+        self.inserted += inserted
+        self.skipped += skipped
+
+
+class ImportJob(ImportProgress):
+    """
+    Uploaded csv import, run in the background by the run_import_jobs
+    command which records its progress here
+    """
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=10,
+                              choices=IMPORT_STATUSES,
+                              default=QUEUED)
+    total_rows = models.PositiveIntegerField(blank=True, null=True)
+    skipped_file = models.FileField(upload_to='imports/skipped/',
+                                    blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    created_by = models.ForeignKey(User,
+                                   blank=True,
+                                   null=True,
+                                   on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return '{} import {} ({})'.format(self.import_type, self.id,
+                                          self.status)
+
+    def add_progress(self, processed, inserted, skipped):
+        """Add the results of an imported chunk and show the job is alive"""
+        super().add_progress(processed, inserted, skipped)
+        self.heartbeat_at = timezone.now()
+        ImportJob.objects.filter(pk=self.pk).update(
+            heartbeat_at=self.heartbeat_at)
+
+
+class ImportCheckpoint(ImportProgress):
+    """
+    Progress of a seed script import, saved as its chunks are committed so
+    an import of the same file restarted after a failure resumes from it
+    """
+    file_hash = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('import_type', 'file_hash')
+
+    def __str__(self):
+        return '{} import of {} at row {}'.format(
+            self.import_type, self.file_hash[:12], self.processed_rows)
@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+from .user import User
+
+PENDING = "Pending"
+SENT = "Sent"
+DEAD = "Dead"
+
+NOTIFICATION_STATUSES = (
+    (PENDING, "Pending"),
+    (SENT, "Sent"),
+    (DEAD, "Dead"),
+)
+
+
+class Notification(models.Model):
+    """
+    Outbox of Slack messages, written in the same transaction as the change
+    they report and delivered by the send_notifications command
+    """
+    message = models.TextField()
+    recipient = models.ForeignKey(User,
+                                  blank=True,
+                                  null=True,
+                                  on_delete=models.CASCADE)
+    status = models.CharField(max_length=10,
+                              choices=NOTIFICATION_STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-id']
+        index_together = ('status', 'next_attempt_at')
+
+    def __str__(self):
+        return '{} to {}'.format(self.status, self.recipient or 'ops channel')
+
+    @classmethod
+    def enqueue(cls, message, recipient=None):
+        """Queue a message to a user, or to the ops channel when no user"""
+        return cls.objects.create(message=message, recipient=recipient)
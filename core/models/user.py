@@ -110,3 +110,26 @@ class UserFeedback(models.Model):
     class Meta:
         verbose_name_plural = "User Feedback"
         ordering = ['-id']
+
+
+class SlackUserId(models.Model):
+    """ Index of Slack member ids by email, shared by all workers """
+    email = models.EmailField(max_length=100, unique=True)
+    slack_id = models.CharField(max_length=50)
+    refreshed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return '{} ({})'.format(self.email, self.slack_id)
+
+
+class UserSyncHash(models.Model):
+    """
+    Hash of the last record synced for a user from the remote directory,
+    so records that did not change are skipped by the next sync
+    """
+    email = models.EmailField(max_length=100, unique=True)
+    content_hash = models.CharField(max_length=64)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.email
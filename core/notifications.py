@@ -0,0 +1,133 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from core.models.asset import (
+    AssetStatusCount, LowStockAlert, AVAILABLE, slack
+)
+from core.models.notification import Notification, DEAD, PENDING, SENT
+
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+# how long a worker has to deliver the notifications it claimed before
+# they are due again
+CLAIM_SECONDS = 600
+
+
+class UndeliverableError(Exception):
+    """Raised when no retry can deliver a notification"""
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying after the given failed attempts"""
+    return min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+
+
+def deliver(notification):
+    recipient = notification.recipient
+    slack_id = None
+    if getattr(slack, 'slack_client', None):
+        slack_id = slack.get_user_slack_id(recipient)
+        if not slack_id:
+            raise UndeliverableError(
+                '{} has no Slack account'.format(recipient.email))
+    response = slack.send_message(notification.message, user=recipient,
+                                  slack_id=slack_id)
+    if response and not response.get('ok'):
+        raise RuntimeError(response.get('error') or 'message not sent')
+
+
+def _record_failure(notification, error, now):
+    notification.attempts += 1
+    notification.last_error = str(error)
+    if notification.attempts >= MAX_ATTEMPTS or \
+            isinstance(error, UndeliverableError):
+        notification.status = DEAD
+        logging.error('Notification %s dead lettered: %s',
+                      notification.pk, error)
+    else:
+        notification.next_attempt_at = now + timedelta(
+            seconds=backoff(notification.attempts))
+
+
+@transaction.atomic
+def claim_due(batch_size, now):
+    """
+    Claim a batch of due notifications by pushing their next attempt
+    CLAIM_SECONDS ahead. Rows are locked with SKIP LOCKED so several
+    workers can claim at once, and a worker that dies mid batch leaves its
+    claims to be retried once they expire.
+    """
+    notifications = list(Notification.objects.select_for_update(
+        skip_locked=True, of=('self',)
+    ).filter(
+        status=PENDING, next_attempt_at__lte=now
+    ).select_related('recipient').order_by('next_attempt_at', 'id')[
+        :batch_size])
+    Notification.objects.filter(
+        pk__in=[notification.pk for notification in notifications]
+    ).update(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+    return notifications
+
+
+def deliver_pending(batch_size=100):
+    """
+    Deliver one batch of due notifications, claimed in a short transaction
+    so no lock or transaction is held while Slack is called
+    :return: number of notifications processed
+    """
+    now = timezone.now()
+    notifications = claim_due(batch_size, now)
+    for notification in notifications:
+        try:
+            deliver(notification)
+        except Exception as err:
+            _record_failure(notification, err, now)
+        else:
+            notification.status = SENT
+            notification.sent_at = timezone.now()
+        notification.save()
+    return len(notifications)
+
+
+def _digest_is_due(now):
+    last_digest = LowStockAlert.objects.aggregate(
+        last_digest=Max('reported_at'))['last_digest']
+    interval = timedelta(seconds=settings.LOW_STOCK_DIGEST_INTERVAL)
+    return not last_digest or last_digest <= now - interval
+
+
+@transaction.atomic
+def queue_low_stock_digest():
+    """
+    Coalesce the low stock alerts raised since the last digest into one
+    notification, at most once per LOW_STOCK_DIGEST_INTERVAL
+    :return: the queued notification or None
+    """
+    now = timezone.now()
+    if not _digest_is_due(now):
+        return None
+    alerts = list(LowStockAlert.objects.select_for_update(
+        skip_locked=True, of=('self',)
+    ).filter(
+        Q(reported_at__isnull=True) | Q(reported_at__lt=F('triggered_at')),
+        is_low=True
+    ).select_related('model_number').order_by('model_number__model_number'))
+    if not alerts:
+        return None
+
+    available = dict(AssetStatusCount.objects.filter(
+        model_number__in=[alert.model_number_id for alert in alerts],
+        status=AVAILABLE).values_list('model_number', 'count'))
+    lines = ["{}: {} available".format(
+        alert.model_number, available.get(alert.model_number_id, 0))
+        for alert in alerts]
+    LowStockAlert.objects.filter(
+        pk__in=[alert.pk for alert in alerts]).update(reported_at=now)
+    return Notification.enqueue(
+        "Warning!! These models are running low:\n" + "\n".join(lines))
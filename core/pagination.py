@@ -1,4 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 def _positive_int(integer_string, strict=False, cutoff=None):
@@ -33,3 +43,110 @@ class PageNumberPagination(PageNumberPagination):
                 pass
 
         return self.page_size
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest first pagination on (created_at, id) for tables that only grow.
+    Pages start after the keys of the last row seen instead of at an
+    OFFSET and no total is counted, so every page costs the same.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor[2])
+        queryset = self.after(queryset, cursor)
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if self.reverse:
+            results.reverse()
+        self.set_links(results, cursor, has_more)
+        return results
+
+    def after(self, queryset, cursor):
+        """Rows past the cursor, nearest first"""
+        if not cursor:
+            return queryset.order_by('-created_at', '-id')
+        created_at, pk, reverse = cursor
+        if reverse:
+            return queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(id__gt=pk)
+            ).order_by('created_at', 'id')
+        return queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(id__lt=pk)
+        ).order_by('-created_at', '-id')
+
+    def set_links(self, results, cursor, has_more):
+        self.next = self.previous = None
+        if not results:
+            return
+        if has_more or self.reverse:
+            self.next = self.encode_cursor(results[-1], reverse=False)
+        if (has_more and self.reverse) or (cursor and not self.reverse):
+            self.previous = self.encode_cursor(results[0], reverse=True)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk, reverse = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError
+            return created_at, int(pk), bool(reverse)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        encoded = urlsafe_b64encode(json.dumps(
+            [row.created_at.isoformat(), row.id, reverse]).encode('ascii'))
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param,
+                                   encoded.decode('ascii'))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next),
+            ('previous', self.previous),
+            ('results', data)
+        ]))
+
+
+class HistoryPagination(PageNumberPagination):
+    """
+    Page number pagination that switches to KeysetPagination when asked
+    with ?pagination=cursor or given a cursor
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if request.query_params.get('pagination') == 'cursor' or \
+                KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,236 @@
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from core.models.asset import (
+    Asset, AssetModelNumber, AssetStatus, AssetStatusCount,
+    AllocationHistory, AssetLog, ASSET_STATUSES, AVAILABLE, ALLOCATED,
+    warn_if_low_stock
+)
+from core.models.notification import Notification
+from core.models.user import User
+
+
+def _lock_asset(asset):
+    return Asset.objects.select_for_update().get(pk=asset.pk)
+
+
+def _record_allocation(asset, user):
+    history, = AllocationHistory.objects.bulk_create([AllocationHistory(
+        asset=asset,
+        current_owner=user,
+        previous_owner_id=asset.assigned_to_id
+    )])
+    return history
+
+
+def _record_status(asset, status):
+    asset_status, = AssetStatus.objects.bulk_create([AssetStatus(
+        asset=asset,
+        current_status=status,
+        previous_status=asset.current_status or None
+    )])
+    AssetStatusCount.record_change(
+        (asset.model_number_id, asset.current_status),
+        (asset.model_number_id, status))
+    warn_if_low_stock(asset.model_number)
+    return asset_status
+
+
+def _update_asset(asset, **fields):
+    fields['last_modified'] = timezone.now()
+    Asset.objects.filter(pk=asset.pk).update(**fields)
+    for field, value in fields.items():
+        setattr(asset, field, value)
+
+
+@transaction.atomic
+def allocate_asset(asset, user):
+    """
+    Allocate an available asset to a user, or unassign it when no user is
+    given, recording the allocation and status change in one transaction
+    """
+    locked_asset = _lock_asset(asset)
+    if locked_asset.current_status != AVAILABLE:
+        raise ValidationError("You can only allocate available assets")
+
+    history = _record_allocation(locked_asset, user)
+    if not user:
+        _update_asset(asset, assigned_to=None)
+        return history
+
+    _record_status(locked_asset, ALLOCATED)
+    _update_asset(asset, assigned_to=user, current_status=ALLOCATED)
+    message = "The asset with serial number {} ".format(
+        locked_asset.serial_number) + "has been allocated to you."
+    Notification.enqueue(message, recipient=user)
+    return history
+
+
+@transaction.atomic
+def change_asset_status(asset, status):
+    """
+    Move an asset to a new status in one transaction, releasing it from its
+    owner when it becomes available again
+    """
+    if status not in dict(ASSET_STATUSES):
+        raise ValidationError(
+            "{} is not a valid asset status".format(status))
+
+    locked_asset = _lock_asset(asset)
+    asset_status = _record_status(locked_asset, status)
+    if status == AVAILABLE and locked_asset.assigned_to_id:
+        _record_allocation(locked_asset, None)
+        _update_asset(asset, current_status=status, assigned_to=None)
+    else:
+        _update_asset(asset, current_status=status)
+    return asset_status
+
+
+def return_asset(asset):
+    """Take an asset back from its owner and make it available"""
+    return change_asset_status(asset, AVAILABLE)
+
+
+def _assets_by_identifier(queryset, identifiers):
+    """Map serial numbers and asset codes to assets in one query"""
+    assets = queryset.filter(
+        Q(serial_number__in=identifiers) | Q(asset_code__in=identifiers))
+    assets_by_identifier = {}
+    for asset in assets:
+        assets_by_identifier.update(
+            {identifier: asset for identifier in
+             (asset.serial_number, asset.asset_code) if identifier})
+    return assets_by_identifier
+
+
+def _load_assets_and_users(allocations):
+    assets = _assets_by_identifier(
+        Asset.objects.select_for_update(),
+        {identifier for identifier, _ in allocations})
+    users = User.objects.filter(email__in={email for _, email in allocations})
+    return assets, {user.email: user for user in users}
+
+
+def _check_allocation(asset, user, allocated_ids):
+    if not asset:
+        return 'asset not found'
+    if not user:
+        return 'user not found'
+    if asset.id in allocated_ids:
+        return 'asset appears more than once'
+    if asset.current_status != AVAILABLE:
+        return 'You can only allocate available assets'
+
+
+def _save_allocations(allocated):
+    AllocationHistory.objects.bulk_create(
+        AllocationHistory(asset=asset, current_owner=user,
+                          previous_owner_id=asset.assigned_to_id)
+        for asset, user in allocated)
+    AssetStatus.objects.bulk_create(
+        AssetStatus(asset=asset, current_status=ALLOCATED,
+                    previous_status=AVAILABLE)
+        for asset, _ in allocated)
+    Asset.objects.filter(pk__in=[asset.pk for asset, _ in allocated]).update(
+        current_status=ALLOCATED,
+        assigned_to=Case(*[When(pk=asset.pk, then=Value(user.pk))
+                           for asset, user in allocated],
+                         output_field=IntegerField()),
+        last_modified=timezone.now())
+    allocated_per_model = Counter(
+        asset.model_number_id for asset, _ in allocated)
+    for model_number_id, total in allocated_per_model.items():
+        AssetStatusCount.adjust(model_number_id, AVAILABLE, -total)
+        AssetStatusCount.adjust(model_number_id, ALLOCATED, total)
+
+    Notification.objects.bulk_create(
+        Notification(message="The asset with serial number {} ".format(
+            asset.serial_number) + "has been allocated to you.",
+            recipient=user)
+        for asset, user in allocated)
+    for model_number in AssetModelNumber.objects.filter(
+            pk__in=allocated_per_model):
+        warn_if_low_stock(model_number)
+
+
+@transaction.atomic
+def bulk_allocate_assets(allocations):
+    """
+    Allocate many assets in one transaction, validating every item against
+    one prefetched set of assets and users
+    :param allocations: list of (asset serial number or code, user email)
+    :return: list of per item results
+    """
+    allocations = [(identifier.strip().upper(), email.strip())
+                   for identifier, email in allocations]
+    assets, users = _load_assets_and_users(allocations)
+    allocated, allocated_ids, results = [], set(), []
+    for identifier, email in allocations:
+        asset, user = assets.get(identifier), users.get(email)
+        reason = _check_allocation(asset, user, allocated_ids)
+        if not reason:
+            allocated.append((asset, user))
+            allocated_ids.add(asset.id)
+        results.append({'asset': identifier, 'email': email,
+                        'allocated': not reason, 'reason': reason})
+    if allocated:
+        _save_allocations(allocated)
+    return results
+
+
+def _check_scan(asset, idempotency_key, recorded_keys):
+    if idempotency_key in recorded_keys:
+        return 'duplicate', 'scan already recorded'
+    if not asset:
+        return 'rejected', 'asset not found'
+    return 'created', None
+
+
+@transaction.atomic
+def _record_asset_logs(scans, checked_by):
+    assets = _assets_by_identifier(
+        Asset.objects.all(),
+        {scan['asset'].strip().upper() for scan in scans})
+    recorded_keys = set(AssetLog.objects.filter(
+        idempotency_key__in=[scan['idempotency_key'] for scan in scans]
+    ).values_list('idempotency_key', flat=True))
+
+    logs, results = [], []
+    for scan in scans:
+        asset = assets.get(scan['asset'].strip().upper())
+        outcome, reason = _check_scan(
+            asset, scan['idempotency_key'], recorded_keys)
+        results.append({'idempotency_key': scan['idempotency_key'],
+                        'asset': scan['asset'],
+                        'status': outcome,
+                        'reason': reason})
+        if outcome == 'created':
+            recorded_keys.add(scan['idempotency_key'])
+            logs.append(AssetLog(asset=asset,
+                                 checked_by=checked_by,
+                                 log_type=scan['log_type'],
+                                 idempotency_key=scan['idempotency_key'],
+                                 scanned_at=scan['scanned_at']))
+    AssetLog.objects.bulk_create(logs)
+    AssetLog.update_asset_checkin_state(logs)
+    return results
+
+
+def record_asset_logs(scans, checked_by):
+    """
+    Record a batch of gate scans, resolving their assets in one query and
+    skipping scans whose idempotency key was already recorded
+    :param scans: list of dicts with asset (serial number or code),
+        log_type, idempotency_key and scanned_at
+    :param checked_by: security user who made the scans
+    :return: list of per scan results
+    """
+    try:
+        return _record_asset_logs(scans, checked_by)
+    except IntegrityError:
+        # a concurrent retry of the same scans committed first
+        return _record_asset_logs(scans, checked_by)
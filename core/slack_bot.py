@@ -1,7 +1,147 @@
 import os
 import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Min
+from django.utils import timezone
 from slackclient import SlackClient
 
+# arbitrary application wide key of the index refresh advisory lock
+REFRESH_LOCK_ID = 5143
+
+
+class SlackAPIError(Exception):
+    """Raised when a Slack API call does not succeed"""
+
+    def __init__(self, method, error):
+        super().__init__('{} failed: {}'.format(method, error))
+        self.error = error
+
+
+class SlackUserIndex(object):
+    """
+    Email to Slack member id index stored in the database so it is shared
+    by all workers. It is filled from paginated users.list calls and
+    refreshed in the background once older than SLACK_USER_INDEX_TTL.
+    """
+    page_size = 200
+
+    def __init__(self, slack_client):
+        self.slack_client = slack_client
+        self._refreshing = threading.Lock()
+
+    def _call(self, method, **kwargs):
+        response = self.slack_client.api_call(method, **kwargs)
+        if not response.get('ok'):
+            raise SlackAPIError(method, response.get('error'))
+        return response
+
+    def fetch_members(self):
+        """Yield (email, slack id) for every active workspace member"""
+        cursor = ''
+        while True:
+            response = self._call(
+                'users.list', limit=self.page_size, cursor=cursor)
+            for member in response.get('members', []):
+                email = member.get('profile', {}).get('email')
+                if email and not member.get('deleted'):
+                    yield email.lower(), member['id']
+            cursor = response.get('response_metadata', {}).get('next_cursor')
+            if not cursor:
+                return
+
+    def is_stale(self):
+        # imported here as core.models imports this module
+        from core.models import SlackUserId
+        refreshed_at = SlackUserId.objects.aggregate(
+            refreshed_at=Min('refreshed_at'))['refreshed_at']
+        ttl = timedelta(seconds=settings.SLACK_USER_INDEX_TTL)
+        return not refreshed_at or refreshed_at < timezone.now() - ttl
+
+    def refresh(self):
+        """
+        Replace the index with the current workspace members, fetching
+        every page before the short transaction that writes them
+        """
+        return self.save_members(dict(self.fetch_members()))
+
+    @transaction.atomic
+    def save_members(self, members):
+        """Replace the index with a map of emails to Slack ids"""
+        from core.models import SlackUserId
+        now = timezone.now()
+        SlackUserId.objects.all().delete()
+        SlackUserId.objects.bulk_create(
+            SlackUserId(email=email, slack_id=slack_id, refreshed_at=now)
+            for email, slack_id in members.items())
+        return len(members)
+
+    def _refresh_if_stale(self):
+        try:
+            with connection.cursor() as cursor:
+                # only one worker refreshes, the others keep reading. The
+                # lock belongs to the session rather than a transaction so
+                # none stays open while the pages are fetched
+                cursor.execute('SELECT pg_try_advisory_lock(%s)',
+                               [REFRESH_LOCK_ID])
+                locked, = cursor.fetchone()
+            if locked and self.is_stale():
+                self.refresh()
+        except SlackAPIError as err:
+            logging.warning('Slack user index not refreshed: %s', err)
+        finally:
+            # closing the connection also releases the lock
+            connection.close()
+            self._refreshing.release()
+
+    def refresh_in_background(self):
+        if not self._refreshing.acquire(blocking=False):
+            return
+        threading.Thread(target=self._refresh_if_stale, daemon=True).start()
+
+    def _lookup_by_email(self, email):
+        """
+        Ask Slack for the member id of an email, None when it has no
+        member. Other errors such as rate limits are raised so the caller
+        can retry later.
+        """
+        try:
+            slack_id = self._call(
+                'users.lookupByEmail', email=email)['user']['id']
+        except SlackAPIError as err:
+            if err.error == 'users_not_found':
+                return None
+            raise
+        self._index_member(email, slack_id)
+        return slack_id
+
+    def _index_member(self, email, slack_id):
+        from core.models import SlackUserId
+        try:
+            SlackUserId.objects.update_or_create(
+                email=email,
+                defaults={'slack_id': slack_id,
+                          'refreshed_at': timezone.now()})
+        except IntegrityError:
+            # a concurrent refresh indexed the member first
+            pass
+
+    def get_slack_id(self, email):
+        """
+        Return the Slack member id of an email from the index, asking Slack
+        for that single member when it is not indexed yet
+        """
+        from core.models import SlackUserId
+        if self.is_stale():
+            self.refresh_in_background()
+        email = email.lower()
+        slack_id = SlackUserId.objects.filter(
+            email=email).values_list('slack_id', flat=True).first()
+        return slack_id or self._lookup_by_email(email)
+
 
 class SlackIntegration(object):
     """Slack Integration class"""
@@ -11,33 +151,28 @@ class SlackIntegration(object):
         slack_token = os.getenv('SLACK_TOKEN')
         if slack_token:
             self.slack_client = SlackClient(slack_token)
+            self.user_index = SlackUserIndex(self.slack_client)
 
     def get_user_slack_id(self, user):
         """Get the slack user ID using the user email"""
         if not user:
             return os.getenv('OPS_CHANNEL') or '#art-test'
-        user_email = user.email
-        response = self.slack_client.api_call("users.list")
-        users = response.get("members")
-        if users:
-            user_id = [
-                member.get('id') for member in users
-                if member.get('profile').get('email') == user_email
-            ]
-        try:
-            return user_id[0]
-        except Exception:
+        slack_id = self.user_index.get_slack_id(user.email)
+        if not slack_id:
             logging.info("User not found")
-            return None
+        return slack_id
 
-    def send_message(self, message, user=None):
-        """Sends message to slack user or channel"""
+    def send_message(self, message, user=None, slack_id=None):
+        """
+        Sends message to slack user or channel, looking up the user's
+        slack id unless the caller already resolved it
+        """
         if hasattr(self, 'slack_client'):
-            slack_id = self.get_user_slack_id(user)
+            slack_id = slack_id or self.get_user_slack_id(user)
             if not slack_id:
                 message = 'The message *"{}"* to {} not sent'.format(
                     message, user.email)
-            self.slack_client.api_call(
+            return self.slack_client.api_call(
                 "chat.postMessage",
                 channel=slack_id,
                 text=message,
@@ -0,0 +1,40 @@
+import time
+
+
+class FakeSlackClient(object):
+    """
+    Offline stand-in for slackclient.SlackClient serving a generated
+    workspace, with an optional per call delay to mimic network latency
+    """
+
+    def __init__(self, members=100, delay=0):
+        self.members = [
+            {'id': 'U{:06d}'.format(index),
+             'deleted': False,
+             'profile': {'email': 'member{}@andela.com'.format(index)}}
+            for index in range(members)
+        ]
+        self.delay = delay
+        self.calls = []
+
+    def api_call(self, method, **kwargs):
+        self.calls.append(method)
+        time.sleep(self.delay)
+        return getattr(self, method.replace('.', '_'))(**kwargs)
+
+    def users_list(self, limit=0, cursor=''):
+        start = int(cursor or 0)
+        end = start + (limit or len(self.members))
+        next_cursor = str(end) if end < len(self.members) else ''
+        return {'ok': True,
+                'members': self.members[start:end],
+                'response_metadata': {'next_cursor': next_cursor}}
+
+    def users_lookupByEmail(self, email):
+        for member in self.members:
+            if member['profile']['email'] == email:
+                return {'ok': True, 'user': member}
+        return {'ok': False, 'error': 'users_not_found'}
+
+    def chat_postMessage(self, **kwargs):
+        return {'ok': True}
@@ -0,0 +1,208 @@
+import csv
+import os
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from functools import partial
+from io import StringIO
+from unittest.mock import patch
+
+from ..models import (
+    Asset,
+    AssetCategory,
+    AssetMake,
+    AssetModelNumber,
+    AssetStatus,
+    AssetStatusCount,
+    AssetSubCategory,
+    AssetType,
+    ImportCheckpoint,
+)
+from core.importers.assets import AssetImport, DryRunImport
+from utils.asset import post_scripts
+from utils.asset.post_scripts import start_checkpoint
+from utils.helpers import file_hash
+
+from core.tests import CoreBaseTestCase
+
+
+def asset_row(code, serial, model_number='MC-001', make='apple'):
+    return {'Category': 'computer', 'Sub-Category': 'laptop',
+            'Type': 'macbook', 'Make': make, 'Model Number': model_number,
+            'Asset Code': code, 'Serial No.': serial}
+
+
+class AssetImportTest(CoreBaseTestCase):
+    """Tests for the chunked asset csv import"""
+
+    def setUp(self):
+        super(AssetImportTest, self).setUp()
+        category = AssetCategory.objects.create(category_name="Computer")
+        sub_category = AssetSubCategory.objects.create(
+            sub_category_name="Laptop", asset_category=category)
+        asset_type = AssetType.objects.create(
+            asset_type="Macbook", asset_sub_category=sub_category)
+        make = AssetMake.objects.create(make_label="Apple",
+                                        asset_type=asset_type)
+        self.model_number = AssetModelNumber.objects.create(
+            model_number="MC-001", make_label=make)
+        Asset.objects.create(asset_code="AND/001", serial_number="SN001",
+                             model_number=self.model_number)
+
+    def run_import(self, rows, import_class=AssetImport):
+        asset_import = import_class()
+        asset_import.import_chunk(list(enumerate(rows, 1)))
+        return asset_import, {
+            record['Count']: record['Reasons']
+            for record in asset_import.skipped_rows.take()}
+
+    def test_rows_repeating_an_identifier_are_skipped(self):
+        asset_import, skipped = self.run_import([
+            asset_row('AND/002', 'SN002'),
+            asset_row('and/002', 'SN003'),
+            asset_row('AND/004', 'sn002'),
+        ])
+        self.assertEqual(asset_import.inserted, 1)
+        self.assertEqual(skipped, {
+            2: ['asset_code AND/002 already exists.'],
+            3: ['serial_number SN002 already exists.'],
+        })
+
+    def test_existing_identifiers_are_skipped(self):
+        _, skipped = self.run_import([asset_row('AND/001', 'SN009'),
+                                      asset_row(None, 'SN001')])
+        self.assertEqual(skipped, {
+            1: ['asset_code AND/001 already exists.'],
+            2: ['serial_number SN001 already exists.'],
+        })
+        self.assertEqual(Asset.objects.count(), 1)
+
+    def test_skipped_row_does_not_reject_its_other_identifier(self):
+        _, skipped = self.run_import([asset_row('AND/002', 'SN001'),
+                                      asset_row('AND/002', 'SN002')])
+        self.assertEqual(skipped,
+                         {1: ['serial_number SN001 already exists.']})
+        self.assertTrue(Asset.objects.filter(asset_code='AND/002',
+                                             serial_number='SN002').exists())
+
+    def test_missing_taxonomy_is_created_once(self):
+        self.run_import([asset_row('AND/002', 'SN002', 'DL-001', 'dell'),
+                         asset_row('AND/003', 'SN003', 'dl-001', 'Dell')])
+        make = AssetMake.objects.get(make_label='Dell')
+        self.assertEqual(make.asset_type.asset_type, 'Macbook')
+        self.assertEqual(AssetType.objects.count(), 1)
+        self.assertEqual(
+            AssetModelNumber.objects.get(model_number='DL-001').make_label,
+            make)
+        self.assertEqual(Asset.objects.filter(
+            model_number__model_number='DL-001').count(), 2)
+
+    def test_imported_assets_are_counted_as_available(self):
+        self.run_import([asset_row('AND/002', 'SN002'),
+                         asset_row('AND/003', 'SN003')])
+        self.assertEqual(AssetStatusCount.objects.get(
+            model_number=self.model_number, status='Available').count, 3)
+        self.assertEqual(AssetStatus.objects.filter(
+            asset__asset_code__in=['AND/002', 'AND/003'],
+            current_status='Available').count(), 2)
+
+    def test_invalid_rows_are_skipped_with_their_reasons(self):
+        row = asset_row(None, None)
+        row['Category'] = ''
+        _, skipped = self.run_import([row])
+        self.assertEqual(skipped, {1: [
+            'category has no value',
+            'asset must have either asset code or serial number']})
+
+    def test_dry_run_skips_the_same_rows_without_writing(self):
+        rows = [asset_row('AND/001', 'SN009'),
+                asset_row('AND/002', 'SN001'),
+                asset_row('AND/002', 'SN002', 'DL-001', 'dell'),
+                asset_row('AND/003', 'SN002')]
+        dry_run, dry_skipped = self.run_import(rows, DryRunImport)
+        self.assertEqual(Asset.objects.count(), 1)
+        self.assertFalse(AssetMake.objects.filter(
+            make_label='Dell').exists())
+        asset_import, skipped = self.run_import(rows)
+        self.assertEqual(dry_skipped, skipped)
+        self.assertEqual(dry_run.inserted,
+                         asset_import.inserted)
+
+    def test_parallel_import_keeps_no_checkpoint(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('Category\ncomputer\n')
+            f.flush()
+            self.assertIsNone(start_checkpoint(f.name, workers=4))
+            self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_parallel_import_refuses_to_resume_a_checkpoint(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('Category\ncomputer\n')
+            f.flush()
+            ImportCheckpoint.objects.create(
+                import_type='assets', file_hash=file_hash(f.name),
+                processed_rows=1000)
+            with self.assertRaises(SystemExit):
+                start_checkpoint(f.name, workers=4)
+            with redirect_stdout(StringIO()):
+                checkpoint = start_checkpoint(f.name)
+            self.assertEqual(checkpoint.processed_rows, 1000)
+
+    def write_csv(self, directory, rows):
+        path = '{}/assets.csv'.format(directory)
+        with open(path, 'w') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def post_assets(self, path, workers=1):
+        """Import a csv two rows per chunk, reporting to its directory"""
+        output = StringIO()
+        with patch.object(post_scripts, 'file_path', os.path.dirname(path)), \
+                patch.object(post_scripts, 'AssetImport',
+                             partial(AssetImport, chunk_size=2)), \
+                redirect_stdout(output), redirect_stderr(StringIO()):
+            post_scripts.post_assets(path, workers)
+        return output.getvalue()
+
+    def test_import_resumes_after_its_checkpoint(self):
+        rows = [asset_row('AND/002', 'SN002'), asset_row('AND/003', 'SN003'),
+                asset_row('AND/001', 'SN004'), asset_row('AND/005', 'SN005'),
+                asset_row('AND/006', 'SN006')]
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_csv(directory, rows)
+            with open('{}/skipped.csv'.format(directory), 'w') as f:
+                f.write('Count,Make,Type,Asset Code,Category,Sub-Category,'
+                        'Model Number,Serial No.,Reasons\n'
+                        '1,apple,macbook,AND/002,computer,laptop,MC-001,'
+                        'SN002,earlier run\n')
+            # the first chunk was committed before the import died
+            ImportCheckpoint.objects.create(
+                import_type='assets', file_hash=file_hash(path),
+                processed_rows=2, inserted=1, skipped=1)
+            output = self.post_assets(path)
+            with open('{}/skipped.csv'.format(directory)) as f:
+                report = list(csv.DictReader(f))
+
+        self.assertIn('Resuming after row 2', output)
+        self.assertFalse(Asset.objects.filter(
+            asset_code__in=['AND/002', 'AND/003']).exists())
+        self.assertEqual(Asset.objects.filter(
+            asset_code__in=['AND/005', 'AND/006']).count(), 2)
+        self.assertEqual([(row['Count'], row['Reasons']) for row in report],
+                         [('1', 'earlier run'),
+                          ('3', 'asset_code AND/001 already exists.')])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_parallel_import_does_not_resume(self):
+        rows = [asset_row('AND/002', 'SN002'), asset_row('AND/003', 'SN003'),
+                asset_row('AND/004', 'SN004')]
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_csv(directory, rows)
+            ImportCheckpoint.objects.create(
+                import_type='assets', file_hash=file_hash(path),
+                processed_rows=2)
+            with self.assertRaises(SystemExit):
+                self.post_assets(path, workers=4)
+        self.assertEqual(Asset.objects.count(), 1)
+        self.assertEqual(ImportCheckpoint.objects.get().processed_rows, 2)
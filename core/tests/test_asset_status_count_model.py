@@ -0,0 +1,70 @@
+from io import StringIO
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+
+from ..models import (
+    Asset,
+    AssetModelNumber,
+    AssetStatus,
+    AssetStatusCount,
+    AllocationHistory,
+    AssetMake,
+    AssetType,
+    AssetSubCategory,
+    AssetCategory
+)
+
+from core.tests import CoreBaseTestCase
+User = get_user_model()
+
+
+class AssetStatusCountModelTest(CoreBaseTestCase):
+    """Tests for the Asset Status Count Model"""
+
+    def setUp(self):
+        super(AssetStatusCountModelTest, self).setUp()
+        asset_category = AssetCategory.objects.create(
+            category_name="Computer")
+        asset_sub_category = AssetSubCategory.objects.create(
+            sub_category_name="Electronics", asset_category=asset_category)
+        asset_type = AssetType.objects.create(
+            asset_type="Accessory", asset_sub_category=asset_sub_category)
+        make_label = AssetMake.objects.create(
+            make_label="Sades", asset_type=asset_type)
+        self.test_assetmodel = AssetModelNumber.objects.create(
+            model_number="IMN50987", make_label=make_label)
+        self.normal_user = User.objects.create(
+            email='test@site.com', cohort=10,
+            slack_handle='@test_user', password='devpassword'
+        )
+        for index in range(3):
+            Asset.objects.create(
+                asset_code="IC00{}".format(index),
+                serial_number="SN00{}".format(index),
+                model_number=self.test_assetmodel)
+        self.asset = Asset.objects.get(asset_code="IC000")
+
+    def get_count(self, status):
+        return AssetStatusCount.get_count(self.test_assetmodel, status)
+
+    def test_new_assets_are_counted_as_available(self):
+        self.assertEqual(self.get_count("Available"), 3)
+        self.assertEqual(self.get_count("Allocated"), 0)
+
+    def test_status_change_moves_asset_between_counters(self):
+        AssetStatus.objects.create(asset=self.asset,
+                                   current_status="Damaged")
+        self.assertEqual(self.get_count("Available"), 2)
+        self.assertEqual(self.get_count("Damaged"), 1)
+
+    def test_allocation_updates_counters(self):
+        AllocationHistory.objects.create(asset=self.asset,
+                                         current_owner=self.normal_user)
+        self.assertEqual(self.get_count("Available"), 2)
+        self.assertEqual(self.get_count("Allocated"), 1)
+
+    def test_rebuild_command_recomputes_counters(self):
+        AssetStatusCount.objects.update(count=0)
+        call_command('rebuild_asset_status_counts', stdout=StringIO())
+        self.assertEqual(self.get_count("Available"), 3)
+        self.assertEqual(AssetStatusCount.objects.count(), 1)
@@ -0,0 +1,124 @@
+import csv
+from io import StringIO
+
+from django.db import connection, transaction
+
+from ..models import (
+    Asset,
+    AssetCategory,
+    AssetMake,
+    AssetModelNumber,
+    AssetStatus,
+    AssetStatusCount,
+    AssetSubCategory,
+    AssetType,
+)
+from core.importers.assets import AssetImport
+from utils.asset.copy_import import CopyImport
+
+from core.tests import CoreBaseTestCase
+
+HEADER = "Category,Sub-Category,Type,Make,Model Number,Asset Code,Serial No.\n"
+ASSET_CSV = HEADER + (
+    "computer,laptop,macbook,apple,mc-001,and/002,sn002\n"
+    "Computer,Laptop,Macbook Pro 13in,a4tech,A4-100,AND/003,SN003\n"
+    " COMPUTER ,LAPTOP,macbook pro 13in,A4TECH,a4-100,AND/004,SN004\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/001,SN005\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/006,SN001\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/006,SN006\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,and/003,SN007\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/008,sn007\n"
+    ",Laptop,Macbook,Apple,MC-001,,\n"
+)
+
+
+class CopyImportTest(CoreBaseTestCase):
+    """Tests for the COPY staging table asset import"""
+
+    def setUp(self):
+        super(CopyImportTest, self).setUp()
+        category = AssetCategory.objects.create(category_name="Computer")
+        sub_category = AssetSubCategory.objects.create(
+            sub_category_name="Laptop", asset_category=category)
+        asset_type = AssetType.objects.create(
+            asset_type="Macbook", asset_sub_category=sub_category)
+        make = AssetMake.objects.create(make_label="Apple",
+                                        asset_type=asset_type)
+        self.model_number = AssetModelNumber.objects.create(
+            model_number="MC-001", make_label=make)
+        Asset.objects.create(asset_code="AND/001", serial_number="SN001",
+                             model_number=self.model_number)
+
+    def copy_import(self, content=ASSET_CSV):
+        skipped = []
+        with connection.cursor() as cursor:
+            inserted = CopyImport(cursor).run(StringIO(content),
+                                              skipped.extend)
+        return inserted, {record['Count']: record['Reasons']
+                          for record in skipped}
+
+    def orm_import(self, content=ASSET_CSV):
+        asset_import = AssetImport()
+        asset_import.import_chunk(
+            list(enumerate(csv.DictReader(StringIO(content)), 1)))
+        return asset_import.inserted, {
+            record['Count']: '; '.join(record['Reasons'])
+            for record in asset_import.skipped_rows.take()}
+
+    def test_staged_values_are_normalized_like_the_orm(self):
+        with connection.cursor() as cursor:
+            copy_import = CopyImport(cursor)
+            with transaction.atomic():
+                copy_import.load(StringIO(ASSET_CSV))
+                copy_import.normalize()
+                cursor.execute(
+                    'SELECT category, asset_type, make, model_number, '
+                    'asset_code FROM {} ORDER BY line'.format(
+                        copy_import.staging))
+                rows = cursor.fetchall()
+                cursor.execute('DROP TABLE {}'.format(copy_import.staging))
+        self.assertEqual(rows[1], ('Computer', 'Macbook Pro 13In', 'A4Tech',
+                                   'A4-100', 'AND/003'))
+        self.assertEqual(rows[2][:3], rows[1][:3])
+        self.assertEqual(rows[-1], (None, 'Macbook', 'Apple', 'MC-001', None))
+
+    def test_existing_taxonomy_is_reused(self):
+        self.copy_import()
+        self.assertEqual(AssetCategory.objects.count(), 1)
+        self.assertEqual(AssetMake.objects.filter(
+            make_label='Apple').count(), 1)
+        make = AssetMake.objects.get(make_label='A4Tech')
+        self.assertEqual(make.asset_type.asset_type, 'Macbook Pro 13In')
+        self.assertEqual(make.asset_type.asset_sub_category.sub_category_name,
+                         'Laptop')
+        self.assertEqual(AssetModelNumber.objects.get(
+            model_number='A4-100').make_label, make)
+
+    def test_skipped_rows_are_reported_with_their_reasons(self):
+        inserted, skipped = self.copy_import()
+        self.assertEqual(inserted, 5)
+        self.assertEqual(skipped, {
+            4: 'asset_code AND/001 already exists.',
+            5: 'serial_number SN001 already exists.',
+            7: 'asset_code AND/003 already exists.',
+            9: 'category has no value; '
+               'asset must have either asset code or serial number',
+        })
+        self.assertEqual(AssetStatusCount.objects.get(
+            model_number=self.model_number, status='Available').count, 4)
+        self.assertEqual(AssetStatus.objects.exclude(
+            asset__asset_code='AND/001').count(), 5)
+
+    def test_copy_import_matches_the_orm_import(self):
+        with transaction.atomic():
+            orm_results = self.orm_import()
+            orm_assets = set(Asset.objects.values_list(
+                'asset_code', 'serial_number', 'model_number__model_number',
+                'model_number__make_label__make_label',
+                'model_number__make_label__asset_type__asset_type'))
+            transaction.set_rollback(True)
+        self.assertEqual(self.copy_import(), orm_results)
+        self.assertEqual(set(Asset.objects.values_list(
+            'asset_code', 'serial_number', 'model_number__model_number',
+            'model_number__make_label__make_label',
+            'model_number__make_label__asset_type__asset_type')), orm_assets)
@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import os
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from utils.helpers import (
+    DOWNLOAD_CHUNK_SIZE, csv_filename, file_hash, get_csv_from_url, open_csv
+)
+
+ASSET_CSV = (
+    "Category,Sub-Category,Type,Make,Model Number,Asset Code,Serial No.\n"
+    "Computer,Laptop,Macbook,Apple,MC-001,AND/001,SN001\n"
+)
+
+
+def csv_response(chunks, content_type='text/csv'):
+    """Streamed urllib3 response serving the given chunks of bytes"""
+    response = MagicMock()
+    response.getheader.return_value = content_type
+    response.stream.return_value = iter(chunks)
+    return response
+
+
+class ImportHelpersTest(SimpleTestCase):
+    """Tests for reading and downloading the csv files of imports"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name + '/'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        with open(self.path + name, 'wb') as f:
+            f.write(content)
+        return self.path + name
+
+    def test_plain_csv_is_read(self):
+        path = self.write('assets.csv', ASSET_CSV.encode('utf-8-sig'))
+        with open_csv(path) as (f, raw):
+            self.assertEqual(f.read(), ASSET_CSV)
+            self.assertEqual(raw.tell(), os.path.getsize(path))
+
+    def test_gzip_csv_is_recognized_by_its_content(self):
+        path = self.write('assets.csv', gzip.compress(ASSET_CSV.encode()))
+        with open_csv(path) as (f, raw):
+            self.assertEqual(f.read(), ASSET_CSV)
+            # progress is measured in compressed bytes read
+            self.assertEqual(raw.tell(), os.path.getsize(path))
+
+    def test_compressed_file_is_found_without_extension(self):
+        self.write('assets.csv.gz', gzip.compress(ASSET_CSV.encode()))
+        self.assertEqual(csv_filename(self.path, 'assets'), 'assets.csv.gz')
+        self.write('assets.csv', ASSET_CSV.encode())
+        self.assertEqual(csv_filename(self.path, 'assets'), 'assets.csv')
+
+    def test_file_hash_reads_in_chunks(self):
+        content = os.urandom(DOWNLOAD_CHUNK_SIZE * 2 + 1)
+        path = self.write('assets.csv', content)
+        self.assertEqual(file_hash(path),
+                         hashlib.sha256(content).hexdigest())
+
+    @patch('utils.helpers.http.urlopen')
+    def test_download_is_streamed_to_disk(self, urlopen):
+        content = gzip.compress(ASSET_CSV.encode())
+        response = csv_response([content[:10], content[10:]],
+                                'application/gzip')
+        urlopen.return_value = response
+        filename = get_csv_from_url(
+            'https://site.com/exports/assets.csv.gz', self.path)
+
+        self.assertEqual(filename, 'assets.csv.gz')
+        self.assertEqual(urlopen.call_args[1]['preload_content'], False)
+        response.stream.assert_called_once_with(DOWNLOAD_CHUNK_SIZE)
+        response.release_conn.assert_called_once_with()
+        with open_csv(self.path + filename) as (f, _):
+            self.assertEqual(f.read(), ASSET_CSV)
+
+    @patch('utils.helpers.http.urlopen')
+    def test_download_of_other_content_is_refused(self, urlopen):
+        urlopen.return_value = csv_response([b'<html>'], 'text/html')
+        with redirect_stdout(StringIO()):
+            filename = get_csv_from_url('https://site.com/assets', self.path)
+        self.assertIsNone(filename)
+        self.assertEqual(os.listdir(self.path), [])
+        urlopen.return_value.release_conn.assert_called_once_with()
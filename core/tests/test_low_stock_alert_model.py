@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from ..models import (
+    Asset,
+    AssetModelNumber,
+    AssetStatus,
+    LowStockAlert,
+    Notification,
+    AssetMake,
+    AssetType,
+    AssetSubCategory,
+    AssetCategory
+)
+from ..notifications import queue_low_stock_digest
+from ..services import bulk_allocate_assets
+
+from core.tests import CoreBaseTestCase
+User = get_user_model()
+
+
+class LowStockAlertModelTest(CoreBaseTestCase):
+    """Tests for the Low Stock Alert Model and digest"""
+
+    def setUp(self):
+        super(LowStockAlertModelTest, self).setUp()
+        asset_category = AssetCategory.objects.create(
+            category_name="Computer")
+        asset_sub_category = AssetSubCategory.objects.create(
+            sub_category_name="Electronics", asset_category=asset_category)
+        asset_type = AssetType.objects.create(
+            asset_type="Accessory", asset_sub_category=asset_sub_category)
+        make_label = AssetMake.objects.create(
+            make_label="Sades", asset_type=asset_type)
+        self.test_assetmodel = AssetModelNumber.objects.create(
+            model_number="IMN50987", make_label=make_label,
+            low_stock_threshold=2)
+        self.user = User.objects.create(
+            email='test@site.com', cohort=10,
+            slack_handle='@test_user', password='devpassword'
+        )
+        for index in range(4):
+            Asset.objects.create(
+                asset_code="IC00{}".format(index),
+                serial_number="SN00{}".format(index),
+                model_number=self.test_assetmodel)
+
+    def get_alert(self):
+        return LowStockAlert.objects.get(model_number=self.test_assetmodel)
+
+    def set_status(self, asset_code, status):
+        AssetStatus.objects.create(
+            asset=Asset.objects.get(asset_code=asset_code),
+            current_status=status)
+
+    def test_alert_is_raised_when_threshold_is_crossed(self):
+        self.set_status("IC000", "Damaged")
+        self.assertFalse(self.get_alert().is_low)
+        self.set_status("IC001", "Damaged")
+        self.assertTrue(self.get_alert().is_low)
+
+    def test_alert_is_cleared_when_stock_recovers(self):
+        self.set_status("IC000", "Damaged")
+        self.set_status("IC001", "Damaged")
+        self.set_status("IC001", "Available")
+        self.assertFalse(self.get_alert().is_low)
+
+    def test_digest_reports_each_shortage_once(self):
+        bulk_allocate_assets([("SN000", self.user.email),
+                              ("SN001", self.user.email),
+                              ("SN002", self.user.email)])
+        digest = queue_low_stock_digest()
+        self.assertIn("IMN50987: 1 available", digest.message)
+        self.assertIsNotNone(self.get_alert().reported_at)
+
+        with override_settings(LOW_STOCK_DIGEST_INTERVAL=0):
+            self.set_status("IC003", "Damaged")
+            self.assertIsNone(queue_low_stock_digest())
+        self.assertEqual(Notification.objects.filter(
+            message__startswith="Warning!!").count(), 1)
+
+    def test_recovered_shortage_is_not_reported(self):
+        self.set_status("IC000", "Damaged")
+        self.set_status("IC001", "Damaged")
+        self.set_status("IC001", "Available")
+        self.assertIsNone(queue_low_stock_digest())
+
+    def test_digest_waits_for_the_interval(self):
+        self.set_status("IC000", "Damaged")
+        self.set_status("IC001", "Damaged")
+        queue_low_stock_digest()
+        self.set_status("IC001", "Available")
+        self.set_status("IC002", "Damaged")
+        self.assertIsNone(queue_low_stock_digest())
+        with override_settings(LOW_STOCK_DIGEST_INTERVAL=0):
+            self.assertIsNotNone(queue_low_stock_digest())
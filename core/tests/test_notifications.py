@@ -0,0 +1,168 @@
+from contextlib import ExitStack
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from ..models import Notification
+from ..models.asset import slack
+from ..notifications import (
+    MAX_ATTEMPTS, backoff, claim_due, deliver_pending
+)
+from ..slack_bot import SlackIntegration, SlackUserIndex
+
+from core.tests import CoreBaseTestCase
+from core.tests.fake_slack import FakeSlackClient
+User = get_user_model()
+# the Slack methods CoreBaseTestCase patches, to run them against a fake
+GET_USER_SLACK_ID = SlackIntegration.get_user_slack_id
+SEND_MESSAGE = SlackIntegration.send_message
+
+
+class NotificationOutboxTest(CoreBaseTestCase):
+    """Tests for the notification outbox and its delivery"""
+
+    def setUp(self):
+        super(NotificationOutboxTest, self).setUp()
+        self.user = User.objects.create(
+            email='test@site.com', cohort=10,
+            slack_handle='@test_user', password='devpassword'
+        )
+        self.notification = Notification.enqueue(
+            "The asset has been allocated to you.", recipient=self.user)
+
+    def test_enqueued_notification_is_pending(self):
+        self.assertEqual(self.notification.status, "Pending")
+        self.assertEqual(self.notification.attempts, 0)
+
+    def test_deliver_pending_sends_and_marks_notifications(self):
+        with patch.object(SlackIntegration, 'send_message',
+                          return_value={'ok': True}) as send_message:
+            self.assertEqual(deliver_pending(), 1)
+        send_message.assert_called_once_with(
+            "The asset has been allocated to you.", user=self.user,
+            slack_id=None)
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Sent")
+        self.assertIsNotNone(self.notification.sent_at)
+        self.assertEqual(deliver_pending(), 0)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        with patch.object(SlackIntegration, 'send_message',
+                          return_value={'ok': False, 'error': 'ratelimited'}):
+            deliver_pending()
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Pending")
+        self.assertEqual(self.notification.attempts, 1)
+        self.assertEqual(self.notification.last_error, 'ratelimited')
+        self.assertGreater(self.notification.next_attempt_at,
+                           timezone.now() + timedelta(seconds=backoff(1) - 5))
+        self.assertEqual(deliver_pending(), 0)
+
+    def test_notification_is_dead_lettered_after_max_attempts(self):
+        Notification.objects.filter(pk=self.notification.pk).update(
+            attempts=MAX_ATTEMPTS - 1)
+        with patch.object(SlackIntegration, 'send_message',
+                          side_effect=ConnectionError('timed out')):
+            deliver_pending()
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Dead")
+        self.assertEqual(self.notification.last_error, 'timed out')
+
+    def test_notifications_are_delivered_outside_the_claim(self):
+        depth = len(connection.savepoint_ids)
+
+        def send_message(message, user=None, slack_id=None):
+            self.assertEqual(len(connection.savepoint_ids), depth)
+            self.assertFalse(Notification.objects.filter(
+                status="Pending", next_attempt_at__lte=timezone.now()
+            ).exists())
+            return {'ok': True}
+        with patch.object(SlackIntegration, 'send_message',
+                          side_effect=send_message):
+            self.assertEqual(deliver_pending(), 1)
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Sent")
+
+    def test_claim_of_a_dead_worker_expires(self):
+        claim_due(100, timezone.now())
+        self.assertEqual(deliver_pending(), 0)
+        Notification.objects.update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_pending(), 1)
+
+    def test_recipient_without_slack_account_is_dead_lettered(self):
+        with patch.object(slack, 'slack_client', create=True), \
+                patch.object(SlackIntegration, 'get_user_slack_id',
+                             return_value=None), \
+                patch.object(SlackIntegration, 'send_message') as send:
+            deliver_pending()
+        send.assert_not_called()
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Dead")
+        self.assertEqual(self.notification.attempts, 1)
+        self.assertEqual(self.notification.last_error,
+                         'test@site.com has no Slack account')
+
+    def fake_slack(self, slack_client):
+        """Deliver through the real Slack integration to a fake client"""
+        stack = ExitStack()
+        stack.enter_context(patch.object(
+            slack, 'slack_client', slack_client, create=True))
+        stack.enter_context(patch.object(
+            slack, 'user_index', SlackUserIndex(slack_client), create=True))
+        stack.enter_context(patch.object(
+            SlackIntegration, 'get_user_slack_id', GET_USER_SLACK_ID))
+        stack.enter_context(patch.object(
+            SlackIntegration, 'send_message', SEND_MESSAGE))
+        stack.enter_context(patch.object(
+            SlackUserIndex, 'refresh_in_background'))
+        return stack
+
+    def test_recipient_is_looked_up_once(self):
+        User.objects.filter(pk=self.user.pk).update(
+            email='member3@andela.com')
+        slack_client = FakeSlackClient(members=5)
+        with self.fake_slack(slack_client):
+            deliver_pending()
+        self.assertEqual(slack_client.calls,
+                         ['users.lookupByEmail', 'chat.postMessage'])
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Sent")
+
+    def test_rate_limited_lookup_is_retried(self):
+        slack_client = FakeSlackClient(members=5)
+        with self.fake_slack(slack_client), patch.object(
+                slack_client, 'users_lookupByEmail',
+                return_value={'ok': False, 'error': 'ratelimited'}):
+            deliver_pending()
+        self.assertNotIn('chat.postMessage', slack_client.calls)
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Pending")
+        self.assertEqual(self.notification.attempts, 1)
+        self.assertEqual(self.notification.last_error,
+                         'users.lookupByEmail failed: ratelimited')
+
+    def test_unknown_recipient_is_dead_lettered(self):
+        slack_client = FakeSlackClient(members=5)
+        with self.fake_slack(slack_client):
+            deliver_pending()
+        self.assertEqual(slack_client.calls, ['users.lookupByEmail'])
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, "Dead")
+
+    def test_backoff_is_capped(self):
+        self.assertEqual(backoff(1), 30)
+        self.assertEqual(backoff(2), 60)
+        self.assertEqual(backoff(20), 3600)
+
+    def test_send_notifications_command_drains_outbox(self):
+        out = StringIO()
+        call_command('send_notifications', '--once', stdout=out)
+        self.assertIn('Processed 1 notifications', out.getvalue())
+        self.assertFalse(Notification.objects.filter(
+            status="Pending").exists())
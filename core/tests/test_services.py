@@ -0,0 +1,92 @@
+from django.core.exceptions import ValidationError
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..models import (
+    Asset,
+    AssetModelNumber,
+    AssetStatus,
+    AssetStatusCount,
+    AllocationHistory,
+    AssetMake,
+    AssetType,
+    AssetSubCategory,
+    AssetCategory
+)
+from ..services import allocate_asset, change_asset_status, return_asset
+
+from core.tests import CoreBaseTestCase
+User = get_user_model()
+
+
+class AssetServicesTest(CoreBaseTestCase):
+    """Tests for the asset allocation and status services"""
+
+    def setUp(self):
+        super(AssetServicesTest, self).setUp()
+        asset_category = AssetCategory.objects.create(
+            category_name="Computer")
+        asset_sub_category = AssetSubCategory.objects.create(
+            sub_category_name="Electronics", asset_category=asset_category)
+        asset_type = AssetType.objects.create(
+            asset_type="Accessory", asset_sub_category=asset_sub_category)
+        make_label = AssetMake.objects.create(
+            make_label="Sades", asset_type=asset_type)
+        self.test_assetmodel = AssetModelNumber.objects.create(
+            model_number="IMN50987", make_label=make_label)
+        self.user = User.objects.create(
+            email='test@site.com', cohort=10,
+            slack_handle='@test_user', password='devpassword'
+        )
+        self.asset = Asset.objects.create(
+            asset_code="IC001",
+            serial_number="SN001",
+            model_number=self.test_assetmodel)
+
+    def test_allocate_asset(self):
+        history = allocate_asset(self.asset, self.user)
+        asset = Asset.objects.get(pk=self.asset.pk)
+        asset_status = AssetStatus.objects.filter(asset=asset).first()
+
+        self.assertEqual(history.current_owner, self.user)
+        self.assertIsNone(history.previous_owner)
+        self.assertEqual(asset.assigned_to, self.user)
+        self.assertEqual(asset.current_status, "Allocated")
+        self.assertEqual(asset_status.current_status, "Allocated")
+        self.assertEqual(asset_status.previous_status, "Available")
+        self.assertEqual(AssetStatusCount.get_count(
+            self.test_assetmodel, "Allocated"), 1)
+        self.assertEqual(AssetStatusCount.get_count(
+            self.test_assetmodel, "Available"), 0)
+
+    def test_allocate_asset_uses_a_fixed_number_of_queries(self):
+        other_asset = Asset.objects.create(
+            asset_code="IC002",
+            serial_number="SN002",
+            model_number=self.test_assetmodel)
+        allocate_asset(other_asset, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            allocate_asset(self.asset, self.user)
+        self.assertLessEqual(len(queries), 12)
+
+    def test_cannot_allocate_unavailable_asset(self):
+        change_asset_status(self.asset, "Damaged")
+        with self.assertRaises(ValidationError):
+            allocate_asset(self.asset, self.user)
+        self.assertEqual(AllocationHistory.objects.count(), 0)
+
+    def test_return_asset_releases_owner(self):
+        allocate_asset(self.asset, self.user)
+        return_asset(self.asset)
+        asset = Asset.objects.get(pk=self.asset.pk)
+        history = AllocationHistory.objects.filter(asset=asset).first()
+
+        self.assertIsNone(asset.assigned_to)
+        self.assertEqual(asset.current_status, "Available")
+        self.assertIsNone(history.current_owner)
+        self.assertEqual(history.previous_owner, self.user)
+
+    def test_change_asset_status_rejects_unknown_status(self):
+        with self.assertRaises(ValidationError):
+            change_asset_status(self.asset, "Unused")
@@ -0,0 +1,109 @@
+import csv
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from functools import partial
+from io import StringIO
+from unittest.mock import patch
+
+from ..importers import SKIPPED_ASSET_FIELDS, SkippedRows
+from ..importers.assets import AssetImport
+from ..models import (
+    Asset,
+    AssetCategory,
+    AssetMake,
+    AssetModelNumber,
+    AssetSubCategory,
+    AssetType,
+)
+from utils.asset import post_scripts
+
+from core.tests import CoreBaseTestCase
+from core.tests.test_asset_import import asset_row
+
+
+def report_rows(report):
+    return [(int(row['Count']), row['Reasons'])
+            for row in csv.DictReader(StringIO(report.getvalue()))]
+
+
+class SkippedRowsTest(CoreBaseTestCase):
+    """Tests for streaming the skipped rows of an import to its report"""
+
+    def setUp(self):
+        super(SkippedRowsTest, self).setUp()
+        category = AssetCategory.objects.create(category_name="Computer")
+        sub_category = AssetSubCategory.objects.create(
+            sub_category_name="Laptop", asset_category=category)
+        asset_type = AssetType.objects.create(
+            asset_type="Macbook", asset_sub_category=sub_category)
+        make = AssetMake.objects.create(make_label="Apple",
+                                        asset_type=asset_type)
+        model_number = AssetModelNumber.objects.create(
+            model_number="MC-001", make_label=make)
+        Asset.objects.create(asset_code="AND/001", serial_number="SN001",
+                             model_number=model_number)
+        self.report = StringIO()
+        self.writer = csv.DictWriter(self.report,
+                                     fieldnames=SKIPPED_ASSET_FIELDS)
+        self.writer.writeheader()
+
+    def test_reasons_of_a_row_are_merged(self):
+        skipped_rows = SkippedRows(self.writer)
+        skipped_rows.add(3, {}, ['first'])
+        skipped_rows.add(1, {}, ['other'])
+        skipped_rows.add(3, {}, ['first', 'second'])
+        self.assertEqual(len(skipped_rows), 2)
+        skipped_rows.flush()
+        self.assertEqual(report_rows(self.report),
+                         [(1, 'other'), (3, 'first; second')])
+        self.assertEqual(skipped_rows.pending, {})
+        self.assertEqual(len(skipped_rows), 2)
+
+    def test_rows_are_written_as_each_chunk_finishes(self):
+        rows = [asset_row('AND/001', 'SN101'), asset_row('AND/002', 'SN102'),
+                asset_row('AND/003', 'SN001'), asset_row('AND/004', 'SN104'),
+                asset_row('AND/004', 'SN105')]
+        sizes = []
+        flush = SkippedRows.flush
+
+        def record_flush(skipped_rows):
+            sizes.append(len(skipped_rows.pending))
+            return flush(skipped_rows)
+        with tempfile.TemporaryDirectory() as directory:
+            path = '{}/assets.csv'.format(directory)
+            with open(path, 'w') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            with patch.object(post_scripts, 'file_path', directory), \
+                    patch.object(post_scripts, 'AssetImport',
+                                 partial(AssetImport, chunk_size=2)), \
+                    patch.object(SkippedRows, 'flush', record_flush), \
+                    redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                asset_import = post_scripts.post_assets(path)
+            with open('{}/skipped.csv'.format(directory)) as f:
+                self.report.write(f.read().split('\n', 1)[1])
+        self.assertEqual(sizes, [1, 1, 1])
+        self.assertEqual(asset_import.inserted, 2)
+        self.assertEqual([count for count, _ in report_rows(self.report)],
+                         [1, 3, 5])
+
+    def test_reports_of_pool_workers_are_merged_in_file_order(self):
+        chunks = [[(1, asset_row('AND/002', 'SN002')),
+                   (2, asset_row('AND/002', 'SN003'))],
+                  [(3, asset_row('AND/001', 'SN004')),
+                   (4, asset_row('AND/005', 'SN005'))]]
+        asset_import = AssetImport(skipped_rows=SkippedRows(self.writer))
+        with patch.object(post_scripts, 'worker_import', None):
+            # each chunk is imported as by a separate pool worker
+            results = []
+            for chunk in chunks:
+                post_scripts.worker_import = None
+                results.append(post_scripts.import_chunk_in_worker(chunk))
+        for inserted, skipped in reversed(results):
+            asset_import.merge(inserted, skipped)
+        asset_import.skipped_rows.flush()
+        self.assertEqual(asset_import.inserted, 2)
+        self.assertEqual(report_rows(self.report), [
+            (2, 'asset_code AND/002 already exists.'),
+            (3, 'asset_code AND/001 already exists.')])
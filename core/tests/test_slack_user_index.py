@@ -0,0 +1,89 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from ..models import SlackUserId
+from ..slack_bot import SlackAPIError, SlackUserIndex
+from core.tests import CoreBaseTestCase
+from core.tests.fake_slack import FakeSlackClient
+
+
+class SlackUserIndexTest(CoreBaseTestCase):
+    """Tests for the Slack user id index"""
+
+    def setUp(self):
+        super(SlackUserIndexTest, self).setUp()
+        self.slack_client = FakeSlackClient(members=450)
+        self.index = SlackUserIndex(self.slack_client)
+        self.patch_background = patch.object(
+            SlackUserIndex, 'refresh_in_background')
+        self.refresh_in_background = self.patch_background.start()
+
+    def tearDown(self):
+        self.patch_background.stop()
+        super(SlackUserIndexTest, self).tearDown()
+
+    def test_refresh_pages_through_all_members(self):
+        self.assertEqual(self.index.refresh(), 450)
+        self.assertEqual(self.slack_client.calls, ['users.list'] * 3)
+        self.assertEqual(SlackUserId.objects.get(
+            email='member449@andela.com').slack_id, 'U000449')
+
+    def test_refresh_fetches_members_outside_a_transaction(self):
+        depth = len(connection.savepoint_ids)
+        depths = []
+        fetch_members = self.index.fetch_members
+
+        def record_depth():
+            for member in fetch_members():
+                depths.append(len(connection.savepoint_ids))
+                yield member
+        with patch.object(self.index, 'fetch_members', record_depth):
+            self.index.refresh()
+        self.assertEqual(set(depths), {depth})
+        self.assertEqual(SlackUserId.objects.count(), 450)
+
+    def test_refresh_drops_members_that_left(self):
+        self.index.refresh()
+        self.slack_client.members[0]['deleted'] = True
+        self.index.refresh()
+        self.assertFalse(SlackUserId.objects.filter(
+            email='member0@andela.com').exists())
+
+    def test_indexed_email_is_resolved_without_calling_slack(self):
+        self.index.refresh()
+        self.slack_client.calls = []
+        self.assertEqual(
+            self.index.get_slack_id('Member7@andela.com'), 'U000007')
+        self.assertEqual(self.slack_client.calls, [])
+        self.refresh_in_background.assert_not_called()
+
+    def test_unindexed_email_is_looked_up_and_stored(self):
+        self.assertEqual(
+            self.index.get_slack_id('member3@andela.com'), 'U000003')
+        self.assertEqual(self.slack_client.calls, ['users.lookupByEmail'])
+        self.assertTrue(SlackUserId.objects.filter(
+            email='member3@andela.com').exists())
+
+    def test_unknown_email_returns_none(self):
+        self.assertIsNone(self.index.get_slack_id('nobody@andela.com'))
+
+    def test_failed_lookup_is_raised(self):
+        with patch.object(self.slack_client, 'users_lookupByEmail',
+                          return_value={'ok': False, 'error': 'ratelimited'}):
+            with self.assertRaises(SlackAPIError) as raised:
+                self.index.get_slack_id('member3@andela.com')
+        self.assertEqual(raised.exception.error, 'ratelimited')
+        self.assertFalse(SlackUserId.objects.exists())
+
+    @override_settings(SLACK_USER_INDEX_TTL=60)
+    def test_stale_index_is_refreshed_in_background(self):
+        self.index.refresh()
+        SlackUserId.objects.update(
+            refreshed_at=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(
+            self.index.get_slack_id('member7@andela.com'), 'U000007')
+        self.refresh_in_background.assert_called_once_with()
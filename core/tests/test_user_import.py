@@ -0,0 +1,61 @@
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+from ..models import User
+from utils.user.post_scripts import post_users
+
+from core.tests import CoreBaseTestCase
+
+USER_CSV = (
+    "first_name,last_name,email,cohort,picture,phone_number\n"
+    "Jane,Doe,JANE@site.com,13,,\n"
+    "John,Doe,john@site.com,12,,0700000001\n"
+    "John,Doe,John@Site.com,14,,\n"
+    "No,Email,,12,,\n"
+    "Ann,Lee,ann@site.com,twelve,,\n"
+)
+
+
+class PostUsersTest(CoreBaseTestCase):
+    """Tests for importing a users csv with post_users"""
+
+    def setUp(self):
+        super(PostUsersTest, self).setUp()
+        self.user = User.objects.create(
+            email='jane@site.com', cohort=12,
+            slack_handle='jane', password='qwerty123')
+
+    def post_users(self, update=False):
+        output = StringIO()
+        with redirect_stdout(output), redirect_stderr(StringIO()):
+            user_import = post_users(StringIO(USER_CSV), 5, 'csv',
+                                     update=update)
+        return user_import, output.getvalue()
+
+    def assert_skipped_reported(self, output):
+        self.assertIn('User John@site.com already exists', output)
+        self.assertIn('email has no value', output)
+        self.assertIn('cohort twelve is not a number', output)
+
+    def test_existing_users_are_skipped(self):
+        user_import, output = self.post_users()
+        self.assertEqual((user_import.inserted, user_import.updated), (1, 0))
+        self.assertIn('There are 1  successfully inserted records', output)
+        self.assertIn('There are 4  skipped records', output)
+        self.assertIn('User JANE@site.com already exists', output)
+        self.assert_skipped_reported(output)
+        self.assertEqual(User.objects.get(email='john@site.com').cohort, 12)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cohort, 12)
+
+    def test_existing_users_are_updated(self):
+        user_import, output = self.post_users(update=True)
+        self.assertEqual((user_import.inserted, user_import.updated), (1, 1))
+        self.assertIn('UPDATED USERS', output)
+        self.assertIn('There are 3  skipped records', output)
+        self.assertNotIn('JANE@site.com', output)
+        self.assert_skipped_reported(output)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cohort, 13)
+        self.assertEqual(User.objects.filter(
+            email__iexact='john@site.com').count(), 1)
@@ -0,0 +1,110 @@
+from unittest.mock import patch
+
+from ..models import User, UserSyncHash
+from core.importers.users import UserImport, UserSync, record_hash
+
+from core.tests import CoreBaseTestCase
+
+
+def user_record(email, cohort=12, phone_number='0700000000'):
+    return {'first_name': 'Jane', 'last_name': 'Doe', 'email': email,
+            'cohort': cohort, 'picture': None, 'phone_number': phone_number}
+
+
+class UserSyncTest(CoreBaseTestCase):
+    """Tests for the incremental user sync"""
+
+    def setUp(self):
+        super(UserSyncTest, self).setUp()
+        self.user = User.objects.create(
+            email='jane@site.com', cohort=12, phone_number='0700000000',
+            slack_handle='jane', password='qwerty123')
+
+    def sync(self, *records):
+        user_sync = UserSync()
+        user_sync.sync_chunk(list(enumerate(records, 1)))
+        return user_sync
+
+    def stored_hash(self, email):
+        return UserSyncHash.objects.filter(email=email).values_list(
+            'content_hash', flat=True).first()
+
+    def test_unchanged_record_is_skipped(self):
+        record = user_record('jane@site.com')
+        self.sync(record)
+        self.assertEqual(self.stored_hash('jane@site.com'),
+                         record_hash(record))
+
+        user_sync = self.sync(record)
+        self.assertEqual(user_sync.unchanged, 1)
+        self.assertEqual(user_sync.user_import.skipped_rows.flush(), [])
+
+    def test_changed_record_updates_user(self):
+        self.sync(user_record('jane@site.com'))
+        record = user_record('jane@site.com', cohort=13)
+        user_sync = self.sync(record)
+
+        self.assertEqual(user_sync.unchanged, 0)
+        self.assertEqual(user_sync.user_import.updated, 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cohort, 13)
+        self.assertEqual(self.stored_hash('jane@site.com'),
+                         record_hash(record))
+
+    def test_new_record_creates_user(self):
+        record = user_record('john@site.com')
+        user_sync = self.sync(record)
+        self.assertEqual(user_sync.user_import.inserted, 1)
+        self.assertEqual(self.stored_hash('john@site.com'),
+                         record_hash(record))
+
+    def test_invalid_record_is_retried(self):
+        self.sync(user_record('john@site.com', cohort='twelve'))
+        self.assertIsNone(self.stored_hash('john@site.com'))
+
+        user_sync = self.sync(user_record('john@site.com', cohort='twelve'))
+        self.assertEqual(user_sync.unchanged, 0)
+        self.assertEqual(len(user_sync.user_import.skipped_rows.flush()), 1)
+
+    def test_record_rejected_by_database_is_retried(self):
+        User.objects.create(email='john@site.com', cohort=12,
+                            slack_handle='john', password='qwerty123')
+        # the user is created after the chunk looked it up
+        with patch.object(UserImport, 'load_existing', return_value={}):
+            user_sync = self.sync(user_record('john@site.com'))
+        self.assertEqual(user_sync.user_import.inserted, 0)
+        self.assertIsNone(self.stored_hash('john@site.com'))
+
+        user_sync = self.sync(user_record('john@site.com'))
+        self.assertEqual(user_sync.unchanged, 0)
+        self.assertEqual(user_sync.user_import.updated, 1)
+        self.assertIsNotNone(self.stored_hash('john@site.com'))
+
+    def test_duplicate_record_keeps_hash_of_imported_one(self):
+        record = user_record('john@site.com')
+        self.sync(record, user_record('john@site.com', cohort=13))
+        self.assertEqual(self.stored_hash('john@site.com'),
+                         record_hash(record))
+        self.assertEqual(User.objects.get(email='john@site.com').cohort, 12)
+
+    def test_nothing_is_loaded_before_the_first_chunk(self):
+        with self.assertNumQueries(0):
+            user_sync = UserSync()
+        self.assertEqual(user_sync.user_import.existing, {})
+
+    def test_chunk_loads_only_its_users(self):
+        User.objects.create(email='other@site.com', cohort=12,
+                            slack_handle='other', password='qwerty123')
+        user_sync = self.sync(user_record('Jane@Site.com', cohort=13))
+        self.assertEqual(list(user_sync.user_import.existing),
+                         ['jane@site.com'])
+        self.assertEqual(user_sync.user_import.updated, 1)
+
+    def test_hash_saved_by_a_chunk_is_used_by_the_next(self):
+        user_sync = UserSync()
+        record = user_record('john@site.com')
+        user_sync.sync_chunk([(1, record)])
+        user_sync.sync_chunk([(2, record)])
+        self.assertEqual(user_sync.unchanged, 1)
+        self.assertEqual(user_sync.user_import.inserted, 1)
+        self.assertEqual(user_sync.user_import.skipped_rows.flush(), [])
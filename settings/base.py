@@ -28,6 +28,10 @@ STATIC_URL = '/static/'
 
 STATICFILES_STORAGE = 'whitenoise.django.GzipManifestStaticFilesStorage'
 
+# uploaded import files and their skipped rows reports
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+MEDIA_URL = '/media/'
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.0/howto/deployment/checklist/
 
@@ -153,6 +157,27 @@ REST_FRAMEWORK = {
 
 OAUTH2_PROVIDER_APPLICATION_MODEL = 'core.APIUser'
 
+FIREBASE_PROJECT_ID = config('PROJECT_ID', default='')
+FIREBASE_CLIENT_EMAIL = config('CLIENT_EMAIL', default='')
+FIREBASE_PRIVATE_KEY = config('PRIVATE_KEY', default='').replace('\\n', '\n')
+
+# Dotted path to the class used to verify Firebase ID tokens. Use
+# 'api.authentication.LocalKeyVerifier' with FIREBASE_PUBLIC_KEYS_FILE to
+# verify tokens offline against locally configured public keys.
+FIREBASE_TOKEN_VERIFIER = config(
+    'FIREBASE_TOKEN_VERIFIER',
+    default='api.authentication.FirebaseAdminVerifier')
+FIREBASE_PUBLIC_KEYS_FILE = config('FIREBASE_PUBLIC_KEYS_FILE', default='')
+FIREBASE_TOKEN_CACHE_SIZE = config('FIREBASE_TOKEN_CACHE_SIZE',
+                                   default=10000, cast=int)
+
+# Seconds before the email -> Slack member id index is refreshed from Slack
+SLACK_USER_INDEX_TTL = config('SLACK_USER_INDEX_TTL', default=3600, cast=int)
+
+# Minimum seconds between two low stock digests
+LOW_STOCK_DIGEST_INTERVAL = config('LOW_STOCK_DIGEST_INTERVAL',
+                                   default=900, cast=int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
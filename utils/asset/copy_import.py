@@ -0,0 +1,339 @@
+import csv
+import os
+
+from django.db import connection, transaction
+
+from core.models.asset import (
+    Asset, AssetModelNumber, AssetStatus, AssetStatusCount, AVAILABLE,
+    warn_if_low_stock
+)
+from core.importers.assets import IDENTIFIERS, TAXONOMY, _normalize
+
+# staging column of each csv column
+STAGING_COLUMNS = {
+    'Category': 'category',
+    'Sub-Category': 'sub_category',
+    'Type': 'asset_type',
+    'Make': 'make',
+    'Model Number': 'model_number',
+    'Asset Code': 'asset_code',
+    'Serial No.': 'serial_number',
+}
+UPPERCASED = ('Model Number', 'Asset Code', 'Serial No.')
+# whitespace str.strip() removes
+WHITESPACE = ' \t\n\r\x0b\x0c'
+
+
+def _column(model, field):
+    return model._meta.get_field(field).column
+
+
+def _defaults(model, exclude):
+    """
+    Columns, SQL expressions and params filling the fields of a model that
+    an import does not set, the way Django would on save
+    """
+    columns, expressions, params = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.name in exclude or \
+                field.attname in exclude:
+            continue
+        if getattr(field, 'auto_now', False) or \
+                getattr(field, 'auto_now_add', False):
+            columns.append(field.column)
+            expressions.append('now()')
+        elif field.has_default():
+            columns.append(field.column)
+            expressions.append('%s')
+            params.append(field.get_default())
+    return columns, expressions, params
+
+
+class CopyImport(object):
+    """
+    Set based asset csv import for very large files. The file is COPYed
+    into an unlogged staging table and every step after that is one SQL
+    statement over the whole table.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.staging = 'asset_import_staging_{}'.format(os.getpid())
+
+    def load(self, f):
+        """Create the staging table and COPY the csv file into it"""
+        header = next(csv.reader(f))
+        raw_columns = ['raw_{}'.format(index) for index in range(len(header))]
+        self.raw = {name.strip(): column
+                    for name, column in zip(header, raw_columns)}
+        missing = set(STAGING_COLUMNS) - set(self.raw)
+        if missing:
+            raise ValueError('The csv has no {} column'.format(
+                ', '.join(sorted(missing))))
+        self.cursor.execute(
+            'CREATE UNLOGGED TABLE {} (line bigserial PRIMARY KEY, {}, {}, '
+            'reasons text[], accepted boolean, asset_id integer)'.format(
+                self.staging,
+                ', '.join('{} text'.format(column) for column in raw_columns),
+                ', '.join('{} text'.format(column)
+                          for column in STAGING_COLUMNS.values())))
+        # indexes built after the rows are updated in this transaction
+        # could not be used by it
+        for _, field in IDENTIFIERS:
+            self.cursor.execute('CREATE INDEX ON {} ({})'.format(
+                self.staging, field))
+        self.cursor.copy_expert(
+            'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                self.staging, ', '.join(raw_columns)), f)
+
+    def load_names(self):
+        """
+        Map the few distinct raw names of each title cased column to their
+        normalized value, computed in Python since initcap() capitalizes
+        differently from str.title() after digits ('A4tech', 'A4Tech')
+        """
+        self.names = '{}_names'.format(self.staging)
+        self.cursor.execute(
+            'CREATE TEMPORARY TABLE {} (name text, raw text, normalized text, '
+            'PRIMARY KEY (name, raw)) ON COMMIT DROP'.format(self.names))
+        for name in STAGING_COLUMNS:
+            if name in UPPERCASED:
+                continue
+            self.cursor.execute(
+                'SELECT DISTINCT {0} FROM {1} WHERE {0} IS NOT NULL'.format(
+                    self.raw[name], self.staging))
+            raw = [value for value, in self.cursor.fetchall()]
+            self.cursor.execute(
+                'INSERT INTO {} SELECT %s, * FROM unnest(%s::text[], '
+                '%s::text[])'.format(self.names),
+                [name, raw, [_normalize(name, value) for value in raw]])
+
+    def normalize(self):
+        """Normalize the values the way the ORM import does"""
+        self.load_names()
+        updates, params = [], []
+        for name, column in STAGING_COLUMNS.items():
+            if name in UPPERCASED:
+                updates.append("{} = NULLIF(upper(btrim({}, %s)), '')".format(
+                    column, self.raw[name]))
+                params.append(WHITESPACE)
+            else:
+                updates.append(
+                    "{} = NULLIF((SELECT normalized FROM {} n WHERE "
+                    "n.name = %s AND n.raw = {}), '')".format(
+                        column, self.names, self.raw[name]))
+                params.append(name)
+        self.cursor.execute('UPDATE {} SET {}'.format(
+            self.staging, ', '.join(updates)), params)
+        self.cursor.execute('ANALYZE {}'.format(self.staging))
+
+    def check_values(self):
+        checks = ["CASE WHEN {} IS NULL THEN '{} has no value' END".format(
+            STAGING_COLUMNS[name], label)
+            for name, _, _, _, _, label in TAXONOMY]
+        checks.append(
+            "CASE WHEN asset_code IS NULL AND serial_number IS NULL THEN "
+            "'asset must have either asset code or serial number' END")
+        fields = [(name, model, field)
+                  for name, model, field, _, _, _ in TAXONOMY] + \
+            [(name, Asset, field) for name, field in IDENTIFIERS]
+        checks.extend(
+            "CASE WHEN char_length({0}) > {1} THEN "
+            "format('{2} %s is longer than {1} characters', {0}) END".format(
+                STAGING_COLUMNS[name],
+                model._meta.get_field(field).max_length, name)
+            for name, model, field in fields)
+        self.cursor.execute(
+            'UPDATE {} SET reasons = array_remove(ARRAY[{}]::text[], '
+            'NULL)'.format(self.staging, ', '.join(checks)))
+
+    def create_taxonomy(self):
+        """Insert the missing taxonomy of valid rows, parents first"""
+        for name, model, field, parent, parent_field, _ in TAXONOMY:
+            columns, expressions, params = _defaults(
+                model, (field, parent_field))
+            select = [STAGING_COLUMNS[name]] + expressions
+            join = ''
+            if parent:
+                parent_model = TAXONOMY[[level[0] for level in TAXONOMY]
+                                        .index(parent)]
+                columns.append(_column(model, parent_field))
+                select.append('parent.id')
+                join = 'JOIN {} parent ON parent.{} = s.{}'.format(
+                    parent_model[1]._meta.db_table,
+                    _column(parent_model[1], parent_model[2]),
+                    STAGING_COLUMNS[parent])
+            self.cursor.execute(
+                "INSERT INTO {table} ({columns}) "
+                "SELECT DISTINCT ON ({name}) {select} FROM {staging} s {join} "
+                "WHERE s.reasons = '{{}}' ORDER BY {name}, s.line "
+                "ON CONFLICT ({name_column}) DO NOTHING".format(
+                    table=model._meta.db_table,
+                    columns=', '.join([_column(model, field)] + columns),
+                    name='s.' + STAGING_COLUMNS[name],
+                    select=', '.join('s.' + column if index == 0 else column
+                                     for index, column in enumerate(select)),
+                    staging=self.staging, join=join,
+                    name_column=_column(model, field)), params)
+
+    def _existing(self, field):
+        return 'EXISTS (SELECT 1 FROM {} a WHERE a.{} = s.{})'.format(
+            Asset._meta.db_table, _column(Asset, field), field)
+
+    def _accepted_line(self, field):
+        """Line of the accepted row using the identifier of a row"""
+        return '(SELECT line FROM {0} e WHERE e.accepted AND e.{1} = s.{1})' \
+            .format(self.staging, field)
+
+    def accept_first_rows(self):
+        """
+        Accept the undecided rows that no earlier undecided or accepted row
+        shares an identifier with
+        :return: number of rows accepted
+        """
+        self.cursor.execute(
+            "UPDATE {staging} s SET accepted = true FROM (SELECT line, "
+            "{ranks} FROM {staging} WHERE reasons = '{{}}' "
+            "AND accepted IS NOT false) ranks "
+            "WHERE ranks.line = s.line AND s.accepted IS NULL AND {first}"
+            .format(
+                staging=self.staging,
+                ranks=', '.join(
+                    'row_number() OVER (PARTITION BY {0} ORDER BY line) '
+                    'AS {0}'.format(field) for _, field in IDENTIFIERS),
+                first=' AND '.join(
+                    '(s.{0} IS NULL OR ranks.{0} = 1)'.format(field)
+                    for _, field in IDENTIFIERS)))
+        return self.cursor.rowcount
+
+    def check_duplicates(self):
+        """
+        Reject identifiers already stored or used by an earlier accepted
+        row. Like the ORM import, a rejected row does not reserve its
+        identifiers, so rows are decided in rounds: the first undecided
+        rows of each identifier are accepted, then the undecided rows
+        sharing an identifier with them are rejected, until every row is
+        decided. Files rarely chain more than a few rounds.
+        """
+        self.cursor.execute(
+            "UPDATE {} s SET accepted = false WHERE reasons = '{{}}' "
+            "AND ({})".format(self.staging, ' OR '.join(
+                self._existing(field) for _, field in IDENTIFIERS)))
+        while self.accept_first_rows():
+            self.cursor.execute(
+                "UPDATE {} s SET accepted = false WHERE s.reasons = '{{}}' "
+                "AND s.accepted IS NULL AND ({})".format(
+                    self.staging, ' OR '.join(
+                        '{} IS NOT NULL'.format(self._accepted_line(field))
+                        for _, field in IDENTIFIERS)))
+        self.cursor.execute(
+            "UPDATE {} s SET reasons = array_remove(ARRAY[{}]::text[], NULL) "
+            "WHERE s.accepted = false".format(self.staging, ', '.join(
+                "CASE WHEN {} OR {} < s.line THEN "
+                "format('{field} %s already exists.', s.{field}) END".format(
+                    self._existing(field), self._accepted_line(field),
+                    field=field)
+                for _, field in IDENTIFIERS)))
+
+    def create_assets(self):
+        """
+        Insert the assets of valid rows with their initial status and
+        counters in one statement and link them to their staging rows
+        """
+        columns, expressions, params = _defaults(
+            Asset, ('asset_code', 'serial_number', 'model_number',
+                    'current_status'))
+        status_columns, status_expressions, status_params = _defaults(
+            AssetStatus, ('asset', 'current_status'))
+        model_number = AssetModelNumber._meta
+        # refresh the planner's view of which rows are valid
+        self.cursor.execute('ANALYZE {}'.format(self.staging))
+        self.cursor.execute(
+            "WITH inserted AS ("
+            " INSERT INTO {asset} (asset_code, serial_number, "
+            " model_number_id, current_status, {columns}) "
+            " SELECT s.asset_code, s.serial_number, m.id, %s, {expressions} "
+            " FROM {staging} s JOIN {model_number} m "
+            " ON m.model_number = s.model_number WHERE s.reasons = '{{}}' "
+            " ORDER BY s.line ON CONFLICT DO NOTHING "
+            " RETURNING id, asset_code, serial_number, model_number_id), "
+            "statuses AS ("
+            " INSERT INTO {status} (asset_id, current_status, "
+            " {status_columns}) "
+            " SELECT id, %s, {status_expressions} FROM inserted), "
+            "counters AS ("
+            " INSERT INTO {counter} (model_number_id, status, count) "
+            " SELECT model_number_id, %s, count(*) FROM inserted "
+            " GROUP BY model_number_id ORDER BY model_number_id "
+            " ON CONFLICT (model_number_id, status) DO UPDATE "
+            " SET count = {counter}.count + EXCLUDED.count) "
+            "UPDATE {staging} s SET asset_id = inserted.id FROM inserted "
+            "WHERE s.reasons = '{{}}' "
+            "AND coalesce(s.asset_code, '') = "
+            "coalesce(inserted.asset_code, '') "
+            "AND coalesce(s.serial_number, '') = "
+            "coalesce(inserted.serial_number, '')"
+            .format(asset=Asset._meta.db_table,
+                    columns=', '.join(columns),
+                    expressions=', '.join(expressions),
+                    staging=self.staging,
+                    model_number=model_number.db_table,
+                    status=AssetStatus._meta.db_table,
+                    status_columns=', '.join(status_columns),
+                    status_expressions=', '.join(status_expressions),
+                    counter=AssetStatusCount._meta.db_table),
+            [AVAILABLE] + params + [AVAILABLE] + status_params + [AVAILABLE])
+        return self.cursor.rowcount
+
+    def skipped_rows(self):
+        """Yield the report record of every row without an asset"""
+        self.cursor.execute(
+            "SELECT s.line, {raw}, coalesce(nullif(array_to_string("
+            "s.reasons, '; '), ''), 'asset already exists') "
+            "FROM {staging} s LEFT JOIN {asset} a ON a.id = s.asset_id "
+            "WHERE a.id IS NULL ORDER BY s.line".format(
+                raw=', '.join('s.' + self.raw[name]
+                              for name in STAGING_COLUMNS),
+                staging=self.staging, asset=Asset._meta.db_table))
+        for line in self.cursor:
+            record = dict(zip(STAGING_COLUMNS, line[1:-1]))
+            record.update({'Count': line[0], 'Reasons': line[-1]})
+            yield record
+
+    def update_low_stock_alerts(self):
+        self.cursor.execute(
+            'SELECT DISTINCT a.model_number_id FROM {} s JOIN {} a '
+            'ON a.id = s.asset_id'.format(self.staging, Asset._meta.db_table))
+        model_number_ids = [row[0] for row in self.cursor.fetchall()]
+        for model_number in AssetModelNumber.objects.filter(
+                pk__in=model_number_ids).order_by('pk'):
+            warn_if_low_stock(model_number)
+
+    def run(self, f, write_skipped):
+        """
+        Import an open csv file in one transaction
+        :param write_skipped: called with the skipped row records
+        :return: number of assets inserted
+        """
+        with transaction.atomic():
+            self.load(f)
+            self.normalize()
+            self.check_values()
+            self.create_taxonomy()
+            self.check_duplicates()
+            inserted = self.create_assets()
+            self.update_low_stock_alerts()
+            write_skipped(self.skipped_rows())
+            self.cursor.execute('DROP TABLE {}'.format(self.staging))
+        return inserted
+
+
+def copy_assets(f, write_skipped):
+    """
+    Import an asset csv with COPY and set based SQL
+    :param f: open csv file
+    :param write_skipped: called with the skipped row records
+    :return: number of assets inserted
+    """
+    with connection.cursor() as cursor:
+        return CopyImport(cursor).run(f, write_skipped)
@@ -1,11 +1,14 @@
 import sys
 import os
 import csv
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, wait
 from tqdm import tqdm
 import django
 
-from utils.helpers import (display_inserted, display_skipped,
-                           write_record_skipped)
+from utils.helpers import (display_inserted, file_hash, open_csv,
+                           skipped_report, write_record_skipped)
 
 project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_dir)
@@ -13,414 +16,155 @@ file_path = sys.path[-1]
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
 django.setup()
 
-from core.models.asset import (
-    AssetType,
-    AssetMake,
-    Asset,
-    AssetModelNumber,
-    AssetCategory,
-    AssetSubCategory,
-) # noqa
+from django.db import connections, transaction  # noqa
 
-rows = []
-out = []
+from core.importers import SkippedRows, chunks  # noqa
+from core.importers.assets import AssetImport, DryRunImport  # noqa
+from core.models.importjob import ImportCheckpoint, ASSETS  # noqa
 
+worker_import = None
 
-def post_asset_make(f, file_length): # noqa
-    """
-    Bulk creates asset make
-    :param f: open csv file
-    :param file_length: length of csv data
-    :return:
-    """
-    f.seek(0)
-    data = csv.DictReader(f, delimiter=',')
-    skipped = dict()
-    inserted_records = []
-    counter = 1
-    with tqdm(total=file_length) as pbar:
-        for row in data:
-            row['count'] = counter
-            make_label_value = row.get('Make', '').strip() or None
-            asset_type_value = row.get('Type', '').strip() or None
-            if not make_label_value:
-                reason = 'asset make has no value'
-                row['Reasons'] = reason
-                skipped['make_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-
-            elif not asset_type_value:
-                reason = 'asset type has no value'
-                row['Reasons'] = reason
-                skipped['type_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
 
-            else:
-                asset_make = AssetMake.objects.\
-                    filter(make_label=make_label_value)\
-                    .exists()
-                asset_type = AssetType.objects.filter(
-                    asset_type=asset_type_value).exists()
-
-                if asset_make:
-                    reason = 'asset_make {0} already exists'.format(
-                        make_label_value)
-                    skipped[make_label_value] = [(reason), counter]
-                elif not asset_type:
-                    reason = 'asset type {0} does not exist'.format(
-                        asset_type_value)
-                    row['Reasons'] = reason
-                    skipped[asset_type_value] = [(reason), counter]
-                    row_check(row)
-                else:
-                    asset_type = AssetType.objects.filter(
-                        asset_type=asset_type_value).first()
-                    new_asset_make = AssetMake.objects.\
-                        create(make_label=make_label_value,
-                               asset_type=asset_type)
-
-                    try:
-                        new_asset_make.save()
-                        inserted_records.append([new_asset_make, counter])
-                    except Exception as e:
-                        reason = 'unable to save asset type {}: {}'.format(
-                            asset_type_value, e)
-                        row['Reasons'] = reason
-                        skipped[asset_type_value] = [(reason), counter]
-                        row_check(row)
-                counter += 1
-            pbar.update(1)
-    print("\n")
-    display_inserted(inserted_records, "ASSET MAKES")
-    display_skipped(skipped)
+def import_chunk_in_worker(chunk):
+    """Import a chunk in a pool process with its own AssetImport"""
+    global worker_import
+    if worker_import is None:
+        worker_import = AssetImport()
+    inserted = worker_import.inserted
+    worker_import.import_chunk(chunk)
+    return (worker_import.inserted - inserted,
+            worker_import.skipped_rows.take())
 
 
-def post_asset(f, file_length): # noqa
+def run_in_pool(asset_import, rows, workers, on_chunk_done):
     """
-    Bulk creates assets
-    :param f: open csv file
-    :param file_length: length of csv data
-    :return:
+    Import chunks of rows in a pool of worker processes, keeping at most
+    two chunks per worker in flight so the file is still streamed. Results
+    are merged in file order so the report can be written as they come.
     """
-    f.seek(0)
-    data = csv.DictReader(f, delimiter=',')
-    skipped = dict()
-    inserted_records = []
-    counter = 1
-    with tqdm(total=file_length) as pbar:
-        for row in data:
-            row['count'] = counter
-            model_number = row.get('Model Number', '').strip() or None
-            asset_code = row.get('Asset Code', '').strip() or None
-            serial_number = row.get('Serial No.', '').strip() or None
-
-            if model_number and (asset_code or serial_number):
-                existing_model_number = AssetModelNumber.objects.get(
-                    model_number=model_number)
-                asset_code_status = None
-                serial_number_status = None
-                if asset_code:
-                    asset_code_status = Asset.objects.filter(
-                        asset_code=asset_code).exists()
-                if serial_number:
-                    serial_number_status = Asset.objects.filter(
-                        serial_number=serial_number).exists()
-                if asset_code_status:
-                    reason = 'asset_code {0} already exists.'.format(
-                        asset_code)
-                    row['Reasons'] = reason
-                    skipped[asset_code] = [(reason), counter]
-                    row_check(row)
-
-                elif serial_number_status:
-                    reason = 'serial_number {0} already exists.'.format(
-                        serial_number)
-                    row['Reasons'] = reason
-                    skipped[serial_number] = [(reason), counter]
-                    row_check(row)
-                elif not existing_model_number:
-                    reason = 'model number {0} does not exist'.format(
-                        model_number)
-                    row['Reasons'] = reason
-                    skipped[model_number] = [(reason), counter]
-                    row_check(row)
-                else:
-                    asset = Asset()
-                    asset.asset_code = asset_code
-                    asset.serial_number = serial_number
-                    asset.model_number = existing_model_number
-                    try:
-                        asset.save()
-                        inserted_records.append([asset, counter])
-                    except Exception as e:
-                        reason = 'unable to save asset {} {}: {}'.format(
-                            asset_code, serial_number, e)
-                        row['Reasons'] = reason
-                        skipped['{}_{}'.format(
-                            asset_code, serial_number)] = [(reason),
-                                                           counter]
-                        row_check(row)
-            elif not (asset_code or serial_number):
-                reason = 'asset must have either asset code or serial number'
-                row['Reasons'] = reason
-                skipped['{}_{}'.format(
-                    asset_code, serial_number)] = [(reason), counter]
-                row_check(row)
-            else:
-                reason = 'model number has no value'
-                row['Reasons'] = reason
-                skipped['model_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-            counter += 1
-            pbar.update(1)
-    print("\n")
-    display_inserted(inserted_records, "ASSETS")
-    display_skipped(skipped)
-    write_record_skipped(out, file_path)
-    # print(out)
-
-
-def post_asset_category(f, file_length): # noqa
+    # forked workers must not share this process' database connection
+    connections.close_all()
+    pending = deque()
+
+    def merge_finished():
+        while pending and pending[0].done():
+            future = pending.popleft()
+            asset_import.merge(*future.result())
+            on_chunk_done(future.size)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks(rows, asset_import.chunk_size):
+            if len(pending) >= workers * 2:
+                wait([pending[0]])
+            merge_finished()
+            future = executor.submit(import_chunk_in_worker, chunk)
+            future.size = len(chunk)
+            pending.append(future)
+        wait(pending)
+        merge_finished()
+
+
+class Progress(object):
     """
-    Bulk creates asset category
-    :param f: open csv file
-    :param file_length: length of csv data
-    :return:
+    Called as each chunk of an import finishes, in file order. Flushes the
+    chunk's skipped rows to the report, moves the checkpoint past it and
+    the progress bar to the bytes read from the file.
     """
-    f.seek(0)
-    data = csv.DictReader(f, delimiter=',')
-    skipped = dict()
-    inserted_records = []
-    counter = 1
-    with tqdm(total=file_length) as pbar:
-        for row in data:
-            row['count'] = counter
-            assets_category = row.get('Category', '').strip() or None
 
-            if not assets_category:
-                reason = 'category has no value'
-                row['Reasons'] = reason
-                skipped['cat_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-            else:
-                assets_category_status = AssetCategory.objects. \
-                    filter(category_name=assets_category).exists()
-                if assets_category_status:
-                    reason = 'Category {0} already exists'.format(
-                        assets_category)
-                    skipped[assets_category] = [(reason), counter]
-                else:
-                    new_asset_category = AssetCategory.objects.create(
-                        category_name=assets_category)
-                    try:
-                        new_asset_category.save()
-                        inserted_records.append([new_asset_category, counter])
-                    except Exception as e:
-                        reason = 'Unable to save category {}: {}'.format(
-                            assets_category, e)
-                        row['Reasons'] = reason
-                        skipped[assets_category] = [(reason), counter]
-                        row_check(row)
+    def __init__(self, asset_import, checkpoint, pbar, position):
+        self.asset_import = asset_import
+        self.checkpoint = checkpoint
+        self.pbar = pbar
+        self.position = position
+        self.inserted = asset_import.inserted
 
-            counter += 1
-            pbar.update(1)
-    print("\n")
-    display_inserted(inserted_records, "ASSET CATEGORIES")
-    display_skipped(skipped)
+    def __call__(self, size):
+        skipped = self.asset_import.skipped_rows.flush()
+        inserted = self.asset_import.inserted
+        if self.checkpoint:
+            self.checkpoint.add_progress(size, inserted - self.inserted,
+                                         len(skipped))
+        self.inserted = inserted
+        self.pbar.update(self.position() - self.pbar.n)
 
 
-def post_asset_subcategory(f, file_length): # noqa
+def start_checkpoint(path, workers=1):
     """
-    Bulk creates asset category
-    :param f: open csv file
-    :param file_length: length of csv data
-    :return:
+    Get the checkpoint of an asset csv file, left by an earlier import of
+    the same content that did not finish. Parallel workers commit chunks
+    out of file order, which a count of processed rows cannot describe, so
+    they import without a checkpoint and refuse to resume one.
+    :return: the checkpoint, or None for a parallel import
     """
-    f.seek(0)
-    data = csv.DictReader(f, delimiter=',')
-    skipped = dict()
-    inserted_records = []
-    counter = 1
-    with tqdm(total=file_length) as pbar:
-        for row in data:
-            row['count'] = counter
-            assets_category = row.get('Category', '').strip() or None
-            assets_subcategory = row.get('Sub-Category', '').strip() or None
-            if not assets_category:
-                reason = 'category has no value'
-                row['Reasons'] = reason
-                skipped['cat_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-            elif not assets_subcategory:
-                reason = 'sub-category has no value'
-                row['Reasons'] = reason
-                skipped['subcat_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-
-            else:
-                category = AssetCategory.objects. \
-                    filter(category_name=assets_category)
-                assets_subcategory_status = AssetSubCategory.objects. \
-                    filter(sub_category_name=assets_subcategory).exists()
-                if assets_subcategory_status:
-                    reason = 'Sub Category {0} already exists'.format(
-                        assets_subcategory)
-                    skipped[assets_subcategory] = [(reason), counter]
-                elif not category.exists():
-                    reason = 'category {0} does not exist'.format(
-                        assets_category)
-                    row['Reasons'] = reason
-                    skipped[assets_category] = [(reason), counter]
-                    row_check(row)
-                else:
-                    try:
-                        new_subcategory = AssetSubCategory.objects.create(
-                            sub_category_name=assets_subcategory,
-                            asset_category=category)
-                        new_subcategory.save()
-                        inserted_records.append(
-                            [new_subcategory, counter])
-                    except Exception as e:
-                        reason = 'Unable to save category {}: {}'.format(
-                            assets_subcategory, e)
-                        row['Reasons'] = reason
-                        skipped[assets_category] = [(reason), counter]
-            counter += 1
-            pbar.update(1)
-    print("\n")
-    display_inserted(inserted_records, "ASSET SUB-CATEGORIES")
-    display_skipped(skipped)
-
-
-def post_asset_model_no(f, file_length): # noqa
+    digest = file_hash(path)
+    if workers > 1:
+        if ImportCheckpoint.objects.filter(
+                import_type=ASSETS, file_hash=digest,
+                processed_rows__gt=0).exists():
+            sys.exit('An earlier import of this file did not finish, '
+                     'resume it without --workers.')
+        return None
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+        import_type=ASSETS, file_hash=digest)
+    if checkpoint.processed_rows:
+        print('Resuming after row {0}: {1} inserted and {2} skipped '
+              'before\n'.format(checkpoint.processed_rows,
+                                checkpoint.inserted, checkpoint.skipped))
+    return checkpoint
+
+
+def copy_assets(path):
     """
-    Bulk creates asset model number
-    :param f: open csv file
-    :param file_length: length of csv data
-    :return:
+    Import a very large asset csv through a PostgreSQL COPY staging table
+    :param path: path to the csv file, which may be gzip compressed
+    :return: number of assets inserted
     """
-    f.seek(0)
-    data = csv.DictReader(f, delimiter=',')
-    skipped = dict()
-    inserted_records = []
-    counter = 1
-    with tqdm(total=file_length) as pbar:
-        for row in data:
-            row['count'] = counter
-            asset_make = row.get('Make', '').strip() or None
-            model_number = row.get('Model Number', '').strip() or None
-            if not asset_make:
-                reason = 'make has no value'
-                row['Reasons'] = reason
-                skipped['make_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-            elif not model_number:
-                reason = 'model number has no value'
-                row['Reasons'] = reason
-                skipped['model_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-            else:
-                asset_model_no = AssetModelNumber.objects.filter(
-                    model_number=model_number).exists()
-                existing_make = AssetMake.objects.get(make_label=asset_make)
+    from utils.asset.copy_import import copy_assets as copy
+    print('Importing with COPY, this runs in a single transaction...')
+    with open_csv(path) as (f, _):
+        inserted = copy(f, lambda records: write_record_skipped(
+            records, file_path))
+    print("There are {0}  successfully inserted records\n".format(inserted))
+    print('Skipped rows are listed in {}/skipped.csv'.format(file_path))
+    return inserted
 
-                if asset_model_no:
-                    reason = 'asset_model_no {0} already exists'.format(
-                        model_number)
-                    skipped[model_number] = [(reason), counter]
-                elif not existing_make:
-                    reason = 'asset make {0} does not exist'.format(
-                        asset_make)
-                    row['Reasons'] = reason
-                    skipped[asset_make] = [(reason), counter]
-                    row_check(row)
 
-                else:
-                    new_asset_model_no = AssetModelNumber()
-                    new_asset_model_no.model_number = model_number
-                    new_asset_model_no.make_label = existing_make
-                    try:
-                        new_asset_model_no.save()
-                        inserted_records.append([new_asset_model_no, counter])
-                    except Exception as e:
-                        reason = 'Unable to save model no {}: {}'.format(
-                            model_number, e)
-                        row['Reasons'] = reason
-                        skipped[model_number] = [(reason), counter]
-                        row_check(row)
-                counter += 1
-                pbar.update(1)
-    print("\n")
-    display_inserted(inserted_records, "ASSET MODELS")
-    display_skipped(skipped)
-
-
-def post_asset_types(f, file_length): # noqa
+def post_assets(path, workers=1, dry_run=False):
     """
-    Bulk creates asset types
-    :param f: open csv file
-    :param file_length: length of csv data
-    :return:
+    Import assets and their taxonomy from a csv file in a single pass
+    :param path: path to the csv file, which may be gzip compressed. Its
+        rows are streamed so memory does not grow with the file.
+    :param workers: number of processes importing chunks in parallel. A
+        parallel import keeps no checkpoint, so it cannot be resumed.
+    :param dry_run: only check the rows and report those that would be
+        skipped, without writing to the database
+    :return: the finished AssetImport
     """
-    f.seek(0)
-    data = csv.DictReader(f, delimiter=',')
-    skipped = dict()
-    inserted_records = []
-    counter = 1
-    with tqdm(total=file_length) as pbar:
-        for row in data:
-            row['count'] = counter
-            asset_type = row.get('Type', '').strip() or None
-            sub_category = row.get('Sub-Category', '').strip() or None
-            if not asset_type:
-                reason = 'asset type has no value'
-                row['Reasons'] = reason
-                skipped['type_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-            elif not sub_category:
-                reason = 'sub-category has no value'
-                row['Reasons'] = reason
-                skipped['subcat_{}'.format(counter)] = [(reason), counter]
-                row_check(row)
-            else:
-                sub_category_name = AssetSubCategory.objects.get(
-                    sub_category_name=sub_category)
-                asset_type_status = AssetType.objects.filter(
-                    asset_type=asset_type).exists()
-                if not sub_category_name:
-                    reason = 'Sub Category {0} does not exist'.format(
-                        sub_category)
-                    row['Reasons'] = reason
-                    skipped[sub_category] = [(reason), counter]
-                    row_check(row)
-                elif asset_type_status:
-                    reason = 'asset_type {0} already exists'.format(
-                        asset_type)
-                    skipped[asset_type] = [(reason), counter]
-                else:
-                    asset = AssetType()
-                    asset.asset_type = asset_type
-                    asset.asset_sub_category = sub_category_name
-                    try:
-                        asset.save()
-                        inserted_records.append([asset, counter])
-                    except Exception as e:
-                        reason = 'Unable to save asset type {}: {}'.format(
-                            asset_type, e)
-                        row['Reasons'] = reason
-                        skipped[asset_type] = [(reason), counter]
-                        row_check(row)
-                counter += 1
-                pbar.update(1)
+    checkpoint = None if dry_run else start_checkpoint(path, workers)
+    done = checkpoint.processed_rows if checkpoint else 0
+    with open_csv(path) as (f, raw), \
+            skipped_report(file_path, append=bool(done)) as report, \
+            tqdm(total=os.path.getsize(path), unit='B',
+                 unit_scale=True) as pbar:
+        # rows already committed are parsed but not checked again
+        rows = islice(enumerate(csv.DictReader(f, delimiter=','), 1),
+                      done, None)
+        asset_import = (DryRunImport if dry_run else AssetImport)(
+            skipped_rows=SkippedRows(report))
+        progress = Progress(asset_import, checkpoint, pbar, raw.tell)
+        if workers > 1 and not dry_run:
+            run_in_pool(asset_import, rows, workers, progress)
+        else:
+            for chunk in chunks(rows, asset_import.chunk_size):
+                # commit a chunk together with its checkpoint
+                with transaction.atomic():
+                    asset_import.import_chunk(chunk)
+                    progress(len(chunk))
     print("\n")
-    display_inserted(inserted_records, "ASSET TYPES")
-    display_skipped(skipped)
-
-
-def row_check(row):
-    row['Reasons'] = set([row.pop('Reasons')])
-    for line in out:
-        if line.get('count') == row.get('count'):
-            line['Reasons'] = line['Reasons'].union(row['Reasons'])
-            return
-    out.append(row)
+    display_inserted(asset_import.inserted,
+                     "ASSETS (DRY RUN)" if dry_run else "ASSETS")
+    print('There are {0}  skipped records, listed in {1}/skipped.csv\n'
+          .format(len(asset_import.skipped_rows), file_path))
+    if checkpoint:
+        checkpoint.delete()
+    return asset_import
@@ -3,14 +3,29 @@ import urllib3
 import urllib.parse
 import sys
 import csv
+import gzip
+import hashlib
+import io
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
 
 urllib3.disable_warnings()
 http = urllib3.PoolManager()
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
 
 project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_dir)
 
+from core.importers import SKIPPED_ASSET_FIELDS  # noqa
+
 
 def is_valid_file(file_name):
     if file_name.endswith('.csv'):
@@ -24,21 +39,17 @@ def is_valid_file(file_name):
     return True
 
 
-def display_inserted(result, name=None):
+def display_inserted(inserted, name=None):
+    """Print the number of records an import inserted"""
     print('----------------------------------------------------------------\n')
     print('        --------    TRANSACTIONS SUMMARY        --------        \n')
     print('        --------       {0}       --------        \n'.format(name))
     print('----------------------------------------------------------------\n')
-    print("There are {0}  successfully inserted records\n".format(len(result)))
+    print("There are {0}  successfully inserted records\n".format(inserted))
     print('================================================================\n')
 
-    if len(result) <= 0:
+    if inserted <= 0:
         print("No record was inserted\n")
-    else:
-        print('{0} \t{1} \t '.format('Line No.', 'Description'))
-        print('------------------------------------------------------------\n')
-        for item in result:
-            print('{0}\t{1}'.format(item[1], item[0]))
 
 
 def display_skipped(result):
@@ -83,21 +94,169 @@ def get_csv_from_url(url, filepath):
     _, filename = os.path.split(url)
 
     try:
-        res = http.urlopen('GET', url, redirect=True)
+        res = http.urlopen('GET', url, redirect=True, preload_content=False)
     except (urllib3.exceptions.HTTPError):
         print('There was an error while processing your request')
         return None
 
-    if 'csv' in res.getheader('content-type'):
-        f = open(filepath + filename, 'wb')
-        f.write(res.data)
-        f.close()
-        return filename
+    try:
+        if is_csv_response(res, filename):
+            download(res, filepath + filename)
+            return filename
+    finally:
+        res.release_conn()
 
     print('The url does not point to a valid a csv file')
     return None
 
 
+def is_csv_response(res, filename):
+    content_type = res.getheader('content-type') or ''
+    return 'csv' in content_type or 'gzip' in content_type or \
+        filename.endswith('.gz')
+
+
+def download(res, path):
+    """Stream a response to disk so it is never held in memory"""
+    with open(path, 'wb') as f:
+        for data in res.stream(DOWNLOAD_CHUNK_SIZE):
+            f.write(data)
+
+
+def pooled_session(workers, headers=None):
+    """requests session keeping a connection per concurrent worker"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(headers or {})
+    return session
+
+
+def get_page(session, url):
+    response = session.get(url)
+    response.raise_for_status()
+    return response.json()
+
+
+def page_urls(url, page):
+    """
+    URLs of the remaining pages of a page number paginated response, or
+    None when the next pages can only be found by following the links
+    """
+    next_url = page.get('next')
+    if not next_url or not page.get('results') or 'count' not in page:
+        return None
+    parsed = urllib.parse.urlparse(next_url)
+    query = urllib.parse.parse_qs(parsed.query)
+    if query.get('page') != ['2']:
+        return None
+    pages = math.ceil(page['count'] / len(page['results']))
+    return [parsed._replace(query=urllib.parse.urlencode(
+        dict(query, page=[number]), doseq=True)).geturl()
+        for number in range(2, pages + 1)]
+
+
+def _concurrent_records(session, urls, workers):
+    """Fetch pages a few at a time, yielding their records in order"""
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for url in urls:
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()['results']
+            pending.append(executor.submit(get_page, session, url))
+        while pending:
+            yield from pending.popleft().result()['results']
+
+
+def _linked_records(session, page):
+    while page.get('next'):
+        page = get_page(session, page['next'])
+        yield from page['results']
+
+
+def fetch_records(url, headers=None, workers=4):
+    """
+    Stream the records of a JSON API, following its pagination. The pages
+    of a page number paginated API are fetched concurrently over a pooled
+    session, and at most two pages per worker are held in memory.
+    :return: (number of records if the API says it, iterator of records)
+    """
+    session = pooled_session(workers, headers)
+    page = get_page(session, url)
+    if isinstance(page, list):
+        return len(page), iter(page)
+
+    def records():
+        yield from page['results']
+        urls = page_urls(url, page)
+        if urls is None:
+            yield from _linked_records(session, page)
+        else:
+            yield from _concurrent_records(session, urls, workers)
+    return page.get('count'), records()
+
+
+def csv_filename(filepath, name):
+    """
+    Name of a local csv file given without its extension, compressed with
+    gzip when only the .csv.gz file exists
+    """
+    if name.endswith('.gz'):
+        return name
+    filename = name + '.csv'
+    if not os.path.exists(filepath + filename) and \
+            os.path.exists(filepath + filename + '.gz'):
+        return filename + '.gz'
+    return filename
+
+
+@contextmanager
+def open_csv(path):
+    """
+    Open a csv file, gzip compressed or not, to be streamed
+    :param path: path to the file
+    :return: (text stream of the csv, underlying binary file whose
+        position is the number of bytes read so far)
+    """
+    with open(path, 'rb') as raw:
+        compressed = raw.read(2) == GZIP_MAGIC
+        raw.seek(0)
+        stream = gzip.GzipFile(fileobj=raw) if compressed else raw
+        yield io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''), raw
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file's content
+    :param path: path to the file
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+@contextmanager
+def skipped_report(file_path, append=False):
+    """
+    Open the skipped rows report of an asset import
+    :param file_path: directory of the report
+    :param append: add to the report of an interrupted import
+    :return: csv writer of the report
+    """
+    # line buffered so the rows of committed chunks survive a crash
+    with open(file_path + "/skipped.csv", "a" if append else "w",
+              buffering=1) as csv_file:
+        dw = csv.DictWriter(csv_file, delimiter=',',
+                            fieldnames=SKIPPED_ASSET_FIELDS)
+        if not append:
+            dw.writeheader()
+        yield dw
+
+
 def write_record_skipped(record, file_path):
     """
     Write skipped record to a file
@@ -105,12 +264,7 @@ def write_record_skipped(record, file_path):
     :param file_path: path to the output file
     :return: None
     """
-    filename = "/skipped.csv"
-    fieldnames = ('Count', 'Make', 'Type', 'Asset Code', 'Category',
-                  'Sub-Category', 'Model Number', 'Serial No.', 'Reasons')
-    with open(file_path + filename, "w") as csv_file:
-        print('\n')
-        dw = csv.DictWriter(csv_file, delimiter=',', fieldnames=fieldnames)
-        dw.writeheader()
+    print('\n')
+    with skipped_report(file_path) as dw:
         for row in record:
             dw.writerow(row)
@@ -8,14 +8,10 @@ project_dir = os.path.dirname(
 sys.path.append(project_dir)
 
 from utils.helpers import (
-    is_valid_file, get_csv_from_url, is_valid_url
+    is_valid_file, get_csv_from_url, is_valid_url, csv_filename
 )  # noqa
 
-from utils.asset.post_scripts import (
-    post_asset_make, post_asset_category,
-    post_asset_model_no, post_asset, post_asset_types,
-    post_asset_subcategory,
-)  # noqa
+from utils.asset.post_scripts import copy_assets, post_assets  # noqa
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
 django.setup()
@@ -45,9 +41,23 @@ if __name__ == '__main__':
         without single quotation mark ''.
 
         Note: This program only supports .csv files or file format, it does
-            not support other file formats.
+            not support other file formats. Files may be gzip compressed,
+            'assets' imports assets.csv.gz when there is no assets.csv.
         """
     )
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes importing chunks of rows '
+                             'in parallel. Parallel imports keep no '
+                             'checkpoint, so an interrupted one cannot be '
+                             'resumed')
+    parser.add_argument('--copy', action='store_true',
+                        help='load the file with PostgreSQL COPY into a '
+                             'staging table and import it with set based '
+                             'SQL, for very large files')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='check the file and write the rows that would '
+                             'be skipped to skipped.csv without importing '
+                             'anything')
     args = parser.parse_args()
     parser.print_help()
 
@@ -61,19 +71,15 @@ if __name__ == '__main__':
         filename = csvfile if csvfile else sys.exit()
 
     elif is_valid_file(filename_or_url):
-        filename = filename_or_url + ".csv"
+        filename = csv_filename(filepath, filename_or_url)
 
     else:
         sys.exit()
 
-    with open(filepath + filename, 'r', ) as f:
-        file_length = len(f.readlines()) - 1
-        f.seek(0)
-
-        # seed scripts
-        post_asset_category(f, file_length)
-        post_asset_subcategory(f, file_length)
-        post_asset_types(f, file_length)
-        post_asset_make(f, file_length)
-        post_asset_model_no(f, file_length)
-        post_asset(f, file_length)
+    if args.copy and not args.dry_run:
+        copy_assets(filepath + filename)
+        sys.exit()
+
+    # seed script
+    post_assets(filepath + filename, workers=args.workers,
+                dry_run=args.dry_run)
@@ -1,5 +1,6 @@
 import sys
 import os
+import argparse
 
 import django
 import requests
@@ -9,18 +10,19 @@ project_dir = os.path.dirname(
 sys.path.append(project_dir)
 
 from utils.helpers import (
-    is_valid_file, get_csv_from_url, is_valid_url
+    is_valid_file, get_csv_from_url, is_valid_url, csv_filename, open_csv,
+    fetch_records
 )  # noqa
 
 from utils.user.post_scripts import (
-    post_users
+    post_users, sync_users
 )  # noqa
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
 django.setup()
 
 
-def post_user_csv():
+def post_user_csv(dry_run=False, update=False):
     filename_or_url = input('Enter csv filename '
                             '(without .csv or url link to csv): ').strip()
     filepath = os.path.abspath(os.path.join(os.path.dirname(__file__))) + '/'  # noqa
@@ -31,47 +33,70 @@ def post_user_csv():
         filename = csvfile if csvfile else sys.exit()
 
     elif is_valid_file(filename_or_url):
-        filename = filename_or_url + ".csv"
+        filename = csv_filename(filepath, filename_or_url)
 
     else:
         sys.exit()
 
-    with open(filepath + filename, 'r', ) as f:
-        file_length = len(f.readlines()) - 1
+    with open_csv(filepath + filename) as (f, _):
+        file_length = sum(1 for _ in f) - 1
         f.seek(0)
 
         # seed scripts
-        post_users(f, file_length, 'csv')
+        post_users(f, file_length, 'csv', dry_run, update)
 
 
-def post_user_url():
+def fetch_users():
     endpoint = input('Enter url path : ').strip()
     auth_header = input('Enter Authorization header '
                         '(Bearer <Token> or Token <Token>) : ').strip()
 
     headers = {"Authorization": auth_header}
+    return fetch_records(endpoint, headers=headers)
+
+
+def post_user_url(dry_run=False, update=False):
+    try:
+        total, records = fetch_users()
+        post_users(records, total, 'url', dry_run, update)
+    except (requests.RequestException, ValueError, KeyError):
+        print('Input correct url and Authorization header.')
+
+
+def sync_user_url(dry_run=False, update=False):
+    """Sync users from the pages of a remote API, skipping unchanged ones"""
     try:
-        data = requests.get(endpoint, headers=headers).json()
-        post_users(data, len(data), 'url')
-    except Exception:
+        total, records = fetch_users()
+        sync_users(records, total, dry_run)
+    except (requests.RequestException, ValueError, KeyError):
         print('Input correct url and Authorization header.')
 
 
-def option():
+def option(dry_run=False, update=False):
     user_input = input('Option\n 1. Import from csv\n '
-                       '2. Import from url\n 3. Exit\n: ').strip()
+                       '2. Import from url\n 3. Sync from url\n '
+                       '4. Exit\n: ').strip()
 
     result = {
         1: post_user_csv,
         2: post_user_url,
-        3: exit
+        3: sync_user_url,
+        4: lambda dry_run, update: exit()
     }
     try:
-        result[int(user_input)]()
+        result[int(user_input)](dry_run, update)
     except (KeyError, ValueError):
         print('Invalid Option. Please try again')
-        option()
+        option(dry_run, update)
 
 
 if __name__ == '__main__':
-    option()
+    parser = argparse.ArgumentParser(prog="seed_user")
+    parser.add_argument('--dry-run', action='store_true',
+                        help='list the users that would be skipped without '
+                             'importing anything')
+    parser.add_argument('--update', action='store_true',
+                        help='update the cohort, picture and phone number '
+                             'of users that already exist')
+    args = parser.parse_args()
+    option(args.dry_run, args.update)
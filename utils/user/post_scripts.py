@@ -12,22 +12,23 @@ sys.path.append(project_dir)
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
 django.setup()
 
-from core.models.user import (
-    User
-)  # noqa
+from django.db import transaction  # noqa
 
+from core.importers import chunks  # noqa
+from core.importers.users import CHUNK_SIZE, UserImport, UserSync  # noqa
 
-def post_users(f, file_length, data_type):
+
+def post_users(f, file_length, data_type, dry_run=False, update=False):
     """
-    Bulk creates asset make
+    Bulk creates users
     :param type: specifies type of import
     :param f: open csv file
     :param file_length: length of data
-    :return:
+    :param dry_run: only report the rows that would be skipped
+    :param update: update the cohort, picture and phone number of users
+        that already exist
+    :return: the finished UserImport
     """
-    skipped = dict()
-    inserted_records = []
-    counter = 1
     if data_type == 'csv':
         f.seek(0)
         data = csv.DictReader(f, delimiter=',')
@@ -35,24 +36,45 @@ def post_users(f, file_length, data_type):
     else:
         data = f
 
+    user_import = UserImport(update=update, dry_run=dry_run)
+    skipped = dict()
     with tqdm(total=file_length) as pbar:
-        for row in data:
-            email = row.get('email', '').strip()
-            if User.objects.filter(email=email).exists():
-                skipped[row['email']] = [
-                    f"User {email} already exists", counter]
-                continue
-            user_attr = [
-                'first_name', 'last_name', 'email',
-                'cohort', 'picture', 'phone_number'
-            ]
-            user_data = dict()
-            for attr in user_attr:
-                user_data[attr] = row.get(attr)
-            new_user = User.objects.create(**user_data)
-            inserted_records.append([new_user, counter])
-            counter += 1
-            pbar.update(1)
+        for chunk in chunks(enumerate(data, 1), CHUNK_SIZE):
+            user_import.import_chunk(chunk)
+            skipped.update(user_import.flush_skipped())
+            pbar.update(len(chunk))
+    print("\n")
+    name = "USERS (DRY RUN)" if dry_run else "USERS"
+    display_inserted(user_import.inserted, name)
+    if update:
+        display_inserted(user_import.updated, "UPDATED " + name)
+    display_skipped(skipped)
+    return user_import
+
+
+def sync_users(records, total, dry_run=False):
+    """
+    Sync users from a stream of remote records, creating new users and
+    updating the cohort, picture and phone number of changed ones
+    :param records: iterable of user records
+    :param total: number of records, if known
+    :param dry_run: only report what the sync would do
+    :return: the finished UserSync
+    """
+    user_sync = UserSync(dry_run=dry_run)
+    user_import = user_sync.user_import
+    skipped = dict()
+    with tqdm(total=total) as pbar:
+        for chunk in chunks(enumerate(records, 1), CHUNK_SIZE):
+            with transaction.atomic():
+                user_sync.sync_chunk(chunk)
+            skipped.update(user_import.flush_skipped())
+            pbar.update(len(chunk))
     print("\n")
-    display_inserted(inserted_records, "USERS")
+    name = "USERS (DRY RUN)" if dry_run else "USERS"
+    display_inserted(user_import.inserted, name)
+    display_inserted(user_import.updated, "UPDATED " + name)
+    print('{0} users did not change since the last sync\n'.format(
+        user_sync.unchanged))
     display_skipped(skipped)
+    return user_sync